@@ -0,0 +1,167 @@
+# Batch query API for offline evaluation and bulk answering.
+# A whole batch is encoded in one call, routed with one matrix multiply and its FAQ context retrieved
+# with one multi-query Chroma call; only the LLM calls run per query, concurrently under a limit.
+#
+# Usage:
+#     python batch.py --input queries.jsonl --output answers.jsonl [--batch-size 256] [--concurrency 16]
+# The input is JSONL with a "query" field per line (other fields are copied to the output, e.g. labels)
+# or plain text with one query per line.
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from embeddings import encode
+from router import classify_vectors
+from faq import get_relevant_qa_batch, ingest_faq_data
+from pipeline import answer
+from llm import run
+from tracing import request, set_attribute, span
+
+# Define batch tuning knobs (overridable via environment variables)
+BATCH_SIZE = int(os.getenv('BATCH_SIZE', '256'))
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '16'))
+BATCH_ENCODE_SIZE = int(os.getenv('BATCH_ENCODE_SIZE', '64'))
+
+# Define the FAQ data ingested before answering (the index is only rebuilt when the data changed)
+faqs_path = Path(__file__).parent.parent / "resources" / "faq_data.csv"
+
+
+# Define coroutine answering a list of queries, returning one result dict per query in input order
+# A failing query is reported in its result instead of failing the whole batch
+async def ask_batch_async(queries, concurrency=BATCH_CONCURRENCY, encode_batch_size=BATCH_ENCODE_SIZE):
+    queries = list(queries)
+    if not queries:
+        return []
+
+    # Encode and classify every query at once; both are CPU bound, so they run in worker threads
+    with span('batch.encode'):
+        vectors = await asyncio.to_thread(encode, queries, encode_batch_size)
+    with span('batch.route'):
+        routes = await asyncio.to_thread(classify_vectors, vectors)
+
+    # Retrieve the FAQ entries of every FAQ query with one multi-query call
+    faq_positions = [i for i, (route, _) in enumerate(routes) if route == 'faq']
+    retrievals = {}
+    if faq_positions:
+        with span('batch.faq_retrieve'):
+            faq_retrievals = await asyncio.to_thread(
+                get_relevant_qa_batch, [queries[i] for i in faq_positions], vectors[faq_positions]
+            )
+        retrievals = dict(zip(faq_positions, faq_retrievals))
+
+    # Fan the per-query work (LLM calls, SQL) out under the concurrency limit
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def answer_one(i):
+        route, score = routes[i]
+        async with semaphore:
+            start = time.perf_counter()
+            with request('ask_batch', query=queries[i]):
+                set_attribute('route', route)
+                set_attribute('route_score', score)
+                try:
+                    result, error = await answer(route, queries[i], vectors[i], faq_retrieval=retrievals.get(i)), None
+                except Exception as e:
+                    result, error = None, f"{type(e).__name__}: {e}"
+            return {
+                'query': queries[i],
+                'route': route,
+                'route_score': score,
+                'answer': result,
+                'error': error,
+                'latency_ms': round((time.perf_counter() - start) * 1000, 1),
+            }
+
+    return await asyncio.gather(*[answer_one(i) for i in range(len(queries))])
+
+
+# Define synchronous entry point for callers without an event loop
+def ask_batch(queries, concurrency=BATCH_CONCURRENCY, encode_batch_size=BATCH_ENCODE_SIZE):
+    return run(ask_batch_async(queries, concurrency, encode_batch_size))
+
+
+# Define generator reading input records ({"query": ...} dicts) from a JSONL or plain text file ('-' for stdin)
+def read_records(path):
+    f = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                record = json.loads(line)
+                if 'query' not in record:
+                    raise ValueError(f"Input record without a 'query' field: {line[:80]}")
+                yield record
+            else:
+                yield {'query': line}
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+# Define generator splitting records into lists of at most size items
+def chunks(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# Define function answering every record of the input file and writing one JSON line per record, in input order
+def answer_file(input_path, output_path, batch_size=BATCH_SIZE, concurrency=BATCH_CONCURRENCY,
+                encode_batch_size=BATCH_ENCODE_SIZE):
+    out = sys.stdout if output_path == '-' else open(output_path, 'w', encoding='utf-8')
+    routes = Counter()
+    total = errors = 0
+    start = time.perf_counter()
+    try:
+        # Batches are answered one after the other, so memory stays bounded by the batch size
+        for chunk in chunks(read_records(input_path), batch_size):
+            # Keep the app's own prints out of the JSONL when it goes to stdout
+            with contextlib.redirect_stdout(sys.stderr):
+                results = ask_batch([record['query'] for record in chunk], concurrency, encode_batch_size)
+            for record, result in zip(chunk, results):
+                out.write(json.dumps({**record, **result}, ensure_ascii=False) + '\n')
+                routes[result['route']] += 1
+                errors += result['error'] is not None
+            out.flush()
+            total += len(chunk)
+            elapsed = time.perf_counter() - start
+            print(f"Answered {total} queries, {total / elapsed:.1f} queries/sec", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Done: {total} queries in {elapsed:.2f}s ({total / max(elapsed, 1e-9):.1f} queries/sec), "
+        f"routes {dict(routes)}, {errors} errors",
+        file=sys.stderr,
+    )
+    return total, errors
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Answer a file of queries in batches and write the answers as JSONL.')
+    parser.add_argument('--input', required=True, help="JSONL file with a 'query' field per line, or one query per line ('-' for stdin)")
+    parser.add_argument('--output', default='-', help="Output JSONL file ('-' for stdout)")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Queries encoded, routed and retrieved together')
+    parser.add_argument('--concurrency', type=int, default=BATCH_CONCURRENCY, help='Queries answered concurrently')
+    parser.add_argument('--encode-batch-size', type=int, default=BATCH_ENCODE_SIZE, help='Texts per embedding model forward pass')
+    parser.add_argument('--faq-csv', default=str(faqs_path), help='FAQ data to index before answering')
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(sys.stderr):
+        ingest_faq_data(args.faq_csv)
+    _, failed = answer_file(args.input, args.output, args.batch_size, args.concurrency, args.encode_batch_size)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,63 @@
+# Okapi BM25 inverted index for lexical search over short documents (the FAQ questions and answers).
+# Complements vector search on short or keyword-style queries ("COD?", "HDFC offer") where embeddings are weak.
+import math
+import re
+from collections import Counter, defaultdict
+
+# Define the token pattern and the words that carry no meaning for retrieval
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    'a', 'an', 'the', 'is', 'are', 'was', 'were', 'be', 'been', 'am', 'i', 'me', 'my', 'we', 'our', 'you', 'your',
+    'it', 'its', 'this', 'that', 'these', 'those', 'there', 'do', 'does', 'did', 'can', 'could', 'will', 'would',
+    'should', 'shall', 'may', 'might', 'have', 'has', 'had', 'of', 'to', 'in', 'on', 'at', 'for', 'with', 'by',
+    'from', 'as', 'about', 'into', 'after', 'before', 'or', 'and', 'if', 'any', 'some', 'what', 'which', 'who',
+    'how', 'when', 'where', 'why', 'get', 'use', 'using', 'please', 'tell', 'know', 'want', 'so', 'up',
+}
+
+
+# Define function turning a text into index terms: lowercase words without stopwords, with plural 's' removed
+def tokenize(text):
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+# Define an in-memory BM25 index over a list of documents, searched by document position
+class BM25Index:
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.size = len(documents)
+
+        # Inverted index: term -> list of (document position, term frequency)
+        self.postings = defaultdict(list)
+        self.lengths = []
+        for position, document in enumerate(documents):
+            terms = tokenize(document)
+            self.lengths.append(len(terms))
+            for term, frequency in Counter(terms).items():
+                self.postings[term].append((position, frequency))
+        self.average_length = sum(self.lengths) / self.size if self.size else 0.0
+
+        # Inverse document frequency of every term (the +1 keeps it positive for very common terms)
+        self.idf = {
+            term: math.log(1 + (self.size - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    # Return up to k (document position, score) pairs for the query, best first; only documents sharing a term score
+    def search(self, query, k=5):
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for position, frequency in self.postings[term]:
+                length_norm = 1 - self.b + self.b * self.lengths[position] / self.average_length
+                scores[position] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
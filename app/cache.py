@@ -0,0 +1,132 @@
+# Semantic answer cache keyed on query embeddings.
+# A stored answer is served when a new query vector is similar enough to a cached one.
+import threading
+import time
+from collections import OrderedDict, defaultdict
+import numpy as np
+
+
+# Define a bounded LRU cache with TTL expiry that matches entries by cosine similarity
+class SemanticCache:
+    def __init__(self, threshold=0.95, max_size=1024, ttl=3600):
+        # Minimum cosine similarity for a cached answer to be served
+        self.threshold = threshold
+        # Maximum number of entries kept; 0 disables the cache
+        self.max_size = max_size
+        # Seconds after which an entry expires; None keeps entries until evicted
+        self.ttl = ttl
+
+        # Hit and miss counters for monitoring
+        self.hits = 0
+        self.misses = 0
+
+        # Vectors live in a preallocated matrix; each entry owns one row (slot) of it
+        self._matrix = None
+        self._valid = np.zeros(max_size, dtype=bool)
+        # Slot -> (answer, tag, created_at), ordered from least to most recently used
+        self._entries = OrderedDict()
+        # Tag -> slots of the entries stored with it
+        self._tags = defaultdict(set)
+        # Version of the underlying data the cached answers were computed from
+        self._version = None
+        self._lock = threading.Lock()
+
+    # Drop every entry, e.g. when the underlying data changed
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._entries.clear()
+        self._tags.clear()
+        self._valid[:] = False
+
+    # Drop all entries if they were computed from a different version of the data
+    def _check_version(self, version):
+        if version != self._version:
+            self._clear()
+            self._version = version
+
+    # Return the slot of the most similar unexpired entry with the given tag that reaches the threshold, or None;
+    # expired entries met on the way are evicted
+    def _match(self, vector, tag):
+        slots = self._tags.get(tag)
+        if not slots:
+            return None
+
+        # Cosine similarity against the cached vectors with this tag (all vectors are normalised)
+        slots = np.fromiter(slots, dtype=np.intp, count=len(slots))
+        scores = self._matrix[slots] @ vector
+        now = time.monotonic()
+        for i in np.argsort(-scores):
+            if scores[i] < self.threshold:
+                break
+            slot = int(slots[i])
+            if self.ttl is not None and now - self._entries[slot][2] > self.ttl:
+                self._evict(slot)
+                continue
+            return slot
+        return None
+
+    # Return the cached answer closest to the vector, or None on a miss
+    # Entries only match when their tag equals the given tag and their version is current
+    def get(self, vector, tag=None, version=None):
+        if self.max_size == 0:
+            return None
+        with self._lock:
+            self._check_version(version)
+            slot = self._match(np.asarray(vector, dtype=np.float32), tag) if self._entries else None
+            if slot is None:
+                self.misses += 1
+                return None
+
+            # Mark the entry as most recently used
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            return self._entries[slot][0]
+
+    # Store an answer for the given query vector, evicting the least recently used entry if full
+    def put(self, vector, answer, tag=None, version=None):
+        if self.max_size == 0:
+            return
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._check_version(version)
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+
+            # Replace an entry the vector would already be served from, otherwise reuse a free slot,
+            # otherwise evict the least recently used one
+            slot = self._match(vector, tag)
+            if slot is not None:
+                self._evict(slot)
+            else:
+                free_slots = np.flatnonzero(~self._valid)
+                if len(free_slots):
+                    slot = int(free_slots[0])
+                else:
+                    slot = next(iter(self._entries))
+                    self._evict(slot)
+
+            self._matrix[slot] = vector
+            self._valid[slot] = True
+            self._entries[slot] = (answer, tag, time.monotonic())
+            self._tags[tag].add(slot)
+
+    def _evict(self, slot):
+        tag = self._entries.pop(slot)[1]
+        self._tags[tag].discard(slot)
+        if not self._tags[tag]:
+            del self._tags[tag]
+        self._valid[slot] = False
+
+    # Return counters describing the cache effectiveness
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,44 @@
+# Client of the chatbot HTTP API (server.py), used by the Streamlit UI and usable from other Python services.
+import json
+import os
+import httpx
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Define where the API is served and how long to wait for it
+CHATBOT_API_URL = os.getenv('CHATBOT_API_URL', 'http://127.0.0.1:8000')
+CHATBOT_API_TIMEOUT = float(os.getenv('CHATBOT_API_TIMEOUT', '60'))
+
+# Shared keep-alive connection pool
+_client = httpx.Client(base_url=CHATBOT_API_URL, timeout=CHATBOT_API_TIMEOUT)
+
+
+# Define function asking the API a query and returning the full answer
+def ask(query):
+    response = _client.post('/ask', json={'query': query})
+    response.raise_for_status()
+    return response.json()['answer']
+
+
+# Define generator asking the API a query and yielding the answer tokens as they arrive
+def ask_stream(query):
+    with _client.stream('POST', '/ask/stream', json={'query': query}) as response:
+        response.raise_for_status()
+
+        # Parse the server-sent events: an "event:" line (absent for tokens) and a "data:" line, then a blank line
+        event = 'message'
+        for line in response.iter_lines():
+            if line.startswith('event:'):
+                event = line[len('event:'):].strip()
+            elif line.startswith('data:'):
+                data = json.loads(line[len('data:'):])
+                if event == 'message':
+                    yield data['token']
+                elif event == 'error':
+                    raise RuntimeError(f"The chatbot API failed to answer: {data['error']}")
+                elif event == 'done':
+                    return
+            elif not line:
+                event = 'message'
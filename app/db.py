@@ -0,0 +1,204 @@
+# Read-only connection pool and schema migrations for the product SQLite database
+import contextlib
+import os
+import queue
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+# Define path to the SQLite database file
+db_path = Path(__file__).parent / "db.sqlite"
+
+# Define pool and pragma settings (overridable via environment variables)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))
+DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', str(256 * 1024 * 1024)))
+DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', str(64 * 1024)))
+# Migrations are applied by db.py, the catalog loader and server.py before serving; set DB_MIGRATE=1 to also
+# apply them on the first query of a process
+DB_MIGRATE = os.getenv('DB_MIGRATE', '0') == '1'
+# Seconds a caller waits for a connection when every pooled connection is busy
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+
+# Define migrations applied in order; PRAGMA user_version records how many have run
+MIGRATIONS = [
+    # 1: indexes covering the filter and sort columns used by product searches
+    [
+        "CREATE INDEX IF NOT EXISTS idx_product_brand ON product (brand, price, discount, avg_rating)",
+        "CREATE INDEX IF NOT EXISTS idx_product_price ON product (price, discount, avg_rating)",
+        "CREATE INDEX IF NOT EXISTS idx_product_rating ON product (avg_rating, price, discount)",
+        "CREATE INDEX IF NOT EXISTS idx_product_discount ON product (discount, price, avg_rating)",
+    ],
+    # 2: trigram full-text index on title and brand, so '%LIKE%' lookups use an index instead of a full scan,
+    # kept in sync with the product table by triggers
+    [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5("
+        "title, brand, content='product', content_rowid='rowid', tokenize='trigram')",
+        "INSERT INTO product_fts (product_fts) VALUES ('rebuild')",
+        "CREATE TRIGGER IF NOT EXISTS product_fts_insert AFTER INSERT ON product BEGIN "
+        "INSERT INTO product_fts (rowid, title, brand) VALUES (new.rowid, new.title, new.brand); END",
+        "CREATE TRIGGER IF NOT EXISTS product_fts_delete AFTER DELETE ON product BEGIN "
+        "INSERT INTO product_fts (product_fts, rowid, title, brand) VALUES ('delete', old.rowid, old.title, old.brand); END",
+        "CREATE TRIGGER IF NOT EXISTS product_fts_update AFTER UPDATE OF title, brand ON product BEGIN "
+        "INSERT INTO product_fts (product_fts, rowid, title, brand) VALUES ('delete', old.rowid, old.title, old.brand); "
+        "INSERT INTO product_fts (rowid, title, brand) VALUES (new.rowid, new.title, new.brand); END",
+    ],
+]
+
+# Matches "brand LIKE '...'" / "LOWER(title) LIKE '...'" conditions that can be answered from the FTS index
+# (conditions with an ESCAPE or COLLATE clause are left alone, the FTS lookup has no place for it)
+LIKE_PATTERN = re.compile(
+    r"(?:\b(?:LOWER|UPPER)\s*\(\s*(brand|title)\s*\)|\b(brand|title))\s+LIKE\s+('(?:[^']|'')*')"
+    r"(?!\s*(?:ESCAPE|COLLATE)\b)",
+    re.IGNORECASE,
+)
+
+# Matches the semicolons ending a statement, even when followed by comments
+TRAILING_SEMICOLON = re.compile(r";(?=(?:\s|;|--[^\n]*|/\*.*?\*/)*$)", re.DOTALL)
+
+
+# Define function returning a version token for the database; it changes whenever db.sqlite is written
+def db_version():
+    version = []
+    for path in (db_path, Path(f"{db_path}-wal")):
+        if path.exists():
+            stat = path.stat()
+            version.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(version)
+
+
+# Define function bringing the database schema up to date; safe to run repeatedly
+def migrate(path=db_path):
+    with contextlib.closing(sqlite3.connect(path)) as conn:
+        # WAL lets readers proceed while the catalog loader writes; the mode is stored in the file
+        conn.execute("PRAGMA journal_mode=WAL")
+        current = conn.execute("PRAGMA user_version").fetchone()[0]
+        for version, statements in enumerate(MIGRATIONS[current:], start=current + 1):
+            try:
+                with conn:
+                    for statement in statements:
+                        conn.execute(statement)
+                    conn.execute(f"PRAGMA user_version={version}")
+            except sqlite3.OperationalError as e:
+                # e.g. SQLite built without FTS5 or the trigram tokenizer; the app works without it
+                print(f"Skipping database migration {version}: {e}")
+                break
+            print(f"Applied database migration {version}")
+
+
+# Define a fixed-size pool of read-only connections shared by all threads
+class ConnectionPool:
+    def __init__(self, path=db_path, size=DB_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+        # Remember whether the FTS index exists so LIKE conditions can be rewritten to use it
+        with self.connection() as conn:
+            self.has_fts = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'product_fts'"
+            ).fetchone() is not None
+
+    # Open one read-only connection with the read pragmas applied
+    def _connect(self):
+        conn = sqlite3.connect(
+            f"file:{self.path}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+            cached_statements=256,  # compiled statements are reused across requests on this connection
+        )
+        conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+        conn.execute("PRAGMA query_only=1")
+        return conn
+
+    # Borrow a connection for the duration of a with block
+    @contextlib.contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    conn = self._connect()
+                except BaseException:
+                    # Give the slot back so a failed connect doesn't shrink the pool for good
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=DB_POOL_TIMEOUT)
+                except queue.Empty:
+                    raise TimeoutError(f"No database connection free after {DB_POOL_TIMEOUT}s") from None
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    # Run a query and return its column names and rows (plain tuples)
+    def query(self, sql, params=()):
+        with self.connection() as conn:
+            cursor = conn.execute(self.rewrite(sql), params)
+            columns = [c[0] for c in cursor.description]
+            return columns, cursor.fetchall()
+
+    # Run a query returning at most max_rows rows, fetched in batches, and whether more rows matched
+    def query_bounded(self, sql, params=(), max_rows=50, batch_size=64):
+        # Wrap the query so the row cap holds whatever LIMIT (if any) it already has;
+        # one extra row is fetched to tell whether the result was cut off
+        # (the inner query goes on its own lines so a trailing "-- comment" cannot swallow the closing parenthesis)
+        inner = TRAILING_SEMICOLON.sub('', self.rewrite(sql)).strip()
+        bounded = f"SELECT * FROM (\n{inner}\n) LIMIT {max_rows + 1}"
+        with self.connection() as conn:
+            cursor = conn.execute(bounded, params)
+            columns = [c[0] for c in cursor.description]
+            rows = []
+            while len(rows) <= max_rows:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                rows.extend(batch)
+            cursor.close()
+        return columns, rows[:max_rows], len(rows) > max_rows
+
+    # Rewrite '%LIKE%' conditions on brand/title into lookups on the trigram FTS index (same matching rules)
+    def rewrite(self, sql):
+        if not self.has_fts:
+            return sql
+
+        def to_fts(match):
+            column = match.group(1) or match.group(2)
+            return f"rowid IN (SELECT rowid FROM product_fts WHERE {column.lower()} LIKE {match.group(3)})"
+
+        return LIKE_PATTERN.sub(to_fts, sql)
+
+
+# Lazily created process-wide pool
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# Define function returning the shared pool, migrating the database first if DB_MIGRATE is set
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                if DB_MIGRATE:
+                    migrate()
+                _pool = ConnectionPool()
+    return _pool
+
+
+# Apply migrations when the script is run directly
+if __name__ == '__main__':
+    migrate()
+    pool = get_pool()
+    print(pool.query("SELECT name FROM sqlite_master WHERE type IN ('index', 'table') ORDER BY name")[1])
@@ -0,0 +1,134 @@
+# Shared sentence embedding service used by both the semantic router and the FAQ retriever.
+# The model is loaded once per process, on first use, so importing this module is cheap.
+import json
+import os
+import resource
+import threading
+import time
+from pathlib import Path
+import numpy as np
+
+# Define the pre-trained sentence transformer model used for all embeddings
+EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', "sentence-transformers/all-MiniLM-L6-v2")
+
+# Define how the model is run: 'torch' (sentence-transformers, default) or 'onnx' (onnxruntime, exported
+# and int8 quantized by export_onnx.py; no PyTorch import at serving time)
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')
+EMBEDDING_THREADS = int(os.getenv('EMBEDDING_THREADS', '0'))  # 0: onnxruntime default
+
+# Define where the exported ONNX model lives (overridable via environment)
+onnx_model_path = Path(os.getenv('EMBEDDING_ONNX_PATH', Path(__file__).parent / "onnx_model"))
+ONNX_MODEL_FILE = 'model.onnx'
+ONNX_CONFIG_FILE = 'embedding_config.json'
+
+# Lazily initialised model instance and the lock guarding its creation
+_model = None
+_model_lock = threading.Lock()
+
+
+# Define helper returning the peak resident set size of this process in MB
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# Define function returning the identity of the embeddings produced, used to key stored vectors (FAQ and route
+# indexes); vectors of different backends are close but not identical, so they are never mixed
+def embedding_version():
+    if EMBEDDING_BACKEND == 'onnx':
+        config = json.loads((onnx_model_path / ONNX_CONFIG_FILE).read_text())
+        return f"{config['model']}+onnx" + ("-int8" if config['quantized'] else "")
+    return EMBEDDING_MODEL
+
+
+# Define an embedding model running an exported transformer with onnxruntime; encode() reproduces the
+# sentence-transformers pipeline of the model (tokenize, transformer, mean pooling, normalisation)
+class OnnxModel:
+    def __init__(self, path=onnx_model_path, threads=EMBEDDING_THREADS):
+        # Import here so that the PyTorch backend does not need onnxruntime installed
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        path = Path(path)
+        if not (path / ONNX_MODEL_FILE).exists():
+            raise FileNotFoundError(f"No ONNX embedding model in {path}, export it first with: python export_onnx.py")
+        self.config = json.loads((path / ONNX_CONFIG_FILE).read_text())
+
+        # Truncate and pad like the sentence-transformers tokenizer
+        self.tokenizer = Tokenizer.from_file(str(path / 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=self.config['max_seq_length'])
+        self.tokenizer.enable_padding(pad_id=self.config['pad_token_id'], pad_token=self.config['pad_token'])
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            str(path / ONNX_MODEL_FILE), options, providers=['CPUExecutionProvider']
+        )
+        self.inputs = self.config['inputs']
+
+    # Encode texts into embedding vectors (numpy 2-D array), batch_size texts per model call
+    def encode(self, texts, batch_size=32, normalize_embeddings=True, convert_to_numpy=True):
+        texts = list(texts)
+        embeddings = np.zeros((len(texts), self.config['dimension']), dtype=np.float32)
+
+        # Batch texts of similar length together to minimise padding, as sentence-transformers does
+        order = np.argsort([-len(text) for text in texts], kind='stable')
+        for start in range(0, len(texts), batch_size):
+            batch = order[start:start + batch_size]
+            encodings = self.tokenizer.encode_batch([texts[i] for i in batch])
+            feeds = {
+                'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+                'attention_mask': np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                'token_type_ids': np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            hidden = self.session.run(None, {name: feeds[name] for name in self.inputs})[0]
+
+            # Mean pooling over the real (non-padding) tokens
+            mask = feeds['attention_mask'][..., None].astype(np.float32)
+            embeddings[batch] = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        if normalize_embeddings:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings
+
+
+# Define function returning the shared model, loading it on first call
+def get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            # Re-check inside the lock in case another thread loaded it meanwhile
+            if _model is None:
+                start = time.perf_counter()
+                rss_before = peak_rss_mb()
+
+                if EMBEDDING_BACKEND == 'onnx':
+                    _model = OnnxModel()
+                else:
+                    # Import here so that torch is only pulled in when embeddings are needed
+                    from sentence_transformers import SentenceTransformer
+                    _model = SentenceTransformer(EMBEDDING_MODEL)
+
+                # Report the cold start cost of the model
+                print(
+                    f"Embedding model {embedding_version()} loaded in {time.perf_counter() - start:.2f}s "
+                    f"(peak RSS {rss_before:.0f} MB -> {peak_rss_mb():.0f} MB)"
+                )
+    return _model
+
+
+# Define function to encode a list of texts into normalised embedding vectors (numpy 2-D array)
+# The model processes the texts batch_size at a time; larger batches trade memory for throughput
+def encode(texts, batch_size=32):
+    return get_model().encode(
+        list(texts),
+        batch_size=batch_size,
+        normalize_embeddings=True,
+        convert_to_numpy=True,
+    )
+
+
+# Define function to encode a single query into one normalised vector (numpy 1-D array)
+def embed_query(query):
+    return encode([query])[0]
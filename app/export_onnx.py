@@ -0,0 +1,84 @@
+# Export the sentence embedding model to ONNX with int8 dynamic quantization for EMBEDDING_BACKEND=onnx.
+# Needs the full PyTorch stack (sentence-transformers, onnx) once, at export time; serving only needs
+# onnxruntime and tokenizers.
+#
+# Usage:
+#     python export_onnx.py [--model sentence-transformers/all-MiniLM-L6-v2] [--output onnx_model] [--no-quantize]
+import argparse
+import json
+import tempfile
+from pathlib import Path
+from embeddings import EMBEDDING_MODEL, ONNX_CONFIG_FILE, ONNX_MODEL_FILE, onnx_model_path
+
+
+# Define function exporting the transformer of a sentence-transformers model, its tokenizer and pooling settings
+def export(model_name=EMBEDDING_MODEL, output=onnx_model_path, quantize=True, opset=17):
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+
+    # Load the same model the PyTorch backend uses, so both backends share weights and tokenizer
+    st_model = SentenceTransformer(model_name, device='cpu')
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+
+    # Only mean pooling followed by normalisation is reproduced by the ONNX backend
+    pooling = st_model[1]
+    if not getattr(pooling, 'pooling_mode_mean_tokens', False):
+        raise ValueError(f"{model_name} does not use mean pooling, which the ONNX backend expects")
+
+    # Export the transformer with dynamic batch and sequence dimensions
+    sample = tokenizer(["an example sentence", "another one"], padding=True, return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fp32_path = Path(tmp) / 'model_fp32.onnx'
+        with torch.no_grad():
+            torch.onnx.export(
+                transformer,
+                tuple(sample[name] for name in input_names),
+                str(fp32_path),
+                input_names=input_names,
+                output_names=['last_hidden_state'],
+                dynamic_axes=dynamic_axes,
+                opset_version=opset,
+                dynamo=False,
+            )
+
+        # Quantize the weights of the linear layers to int8; activations are quantized on the fly
+        model_path = output / ONNX_MODEL_FILE
+        if quantize:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(str(fp32_path), str(model_path), weight_type=QuantType.QInt8)
+        else:
+            model_path.write_bytes(fp32_path.read_bytes())
+
+    # Save the fast tokenizer (tokenizer.json) and the settings the ONNX backend needs to match sentence-transformers
+    tokenizer.save_pretrained(str(output))
+    config = {
+        'model': model_name,
+        'quantized': quantize,
+        'dimension': st_model.get_sentence_embedding_dimension(),
+        'max_seq_length': st_model.max_seq_length,
+        'pad_token': tokenizer.pad_token,
+        'pad_token_id': tokenizer.pad_token_id,
+        'inputs': input_names,
+    }
+    (output / ONNX_CONFIG_FILE).write_text(json.dumps(config, indent=2))
+    print(f"Exported {model_name} to {model_path} ({model_path.stat().st_size / 1e6:.1f} MB, quantized={quantize})")
+    return model_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the embedding model to ONNX for EMBEDDING_BACKEND=onnx.')
+    parser.add_argument('--model', default=EMBEDDING_MODEL, help='sentence-transformers model name or path')
+    parser.add_argument('--output', default=str(onnx_model_path), help='Output directory')
+    parser.add_argument('--no-quantize', action='store_true', help='Keep float32 weights')
+    parser.add_argument('--opset', type=int, default=17, help='ONNX opset version')
+    args = parser.parse_args()
+
+    export(args.model, args.output, quantize=not args.no_quantize, opset=args.opset)
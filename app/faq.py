@@ -1,11 +1,16 @@
 # Import necessary libraries
-import pandas as pd
+import hashlib
+import threading
+from collections import namedtuple
 from pathlib import Path
-import chromadb
-from chromadb.utils import embedding_functions
-from groq import Groq
+import asyncio
 from dotenv import load_dotenv
 import os
+from embeddings import embedding_version, encode, embed_query
+from cache import SemanticCache
+from bm25 import TOKEN_PATTERN, BM25Index
+from llm import chat, chat_stream, run
+from tracing import set_attribute, span
 
 # Load environment variables from a .env file
 load_dotenv()
@@ -13,82 +18,310 @@ load_dotenv()
 # Define the path to the FAQ CSV data file
 faqs_path = Path(__file__).parent / "resources/faq_data.csv"
 
-# Initialize ChromaDB client
-chroma_client = chromadb.Client()
+# Define where the persistent FAQ vector index lives on disk (overridable via environment)
+faq_index_path = Path(os.getenv('FAQ_INDEX_PATH', Path(__file__).parent / "chroma_db"))
+
+# Lazily created persistent ChromaDB client (embeddings survive restarts and are shared by workers)
+# and the lock guarding its creation; chromadb takes long to import, so it is only imported on first use
+_chroma_client = None
+_chroma_lock = threading.Lock()
 
 # Define collection name for storing FAQ embeddings
 collection_name_faq = 'faqs'
 
-# Initialize Groq LLM client
-groq_client = Groq()
+# Define how many FAQ rows are embedded and written to ChromaDB per batch
+ingest_batch_size = 512
+
+# Define hybrid retrieval settings (overridable via environment variables)
+FAQ_CANDIDATES = int(os.getenv('FAQ_CANDIDATES', '5'))  # hits taken from each of the vector and BM25 searches
+FAQ_MAX_K = int(os.getenv('FAQ_MAX_K', '3'))  # most FAQ entries handed to the LLM
+FAQ_MIN_SIMILARITY = float(os.getenv('FAQ_MIN_SIMILARITY', '0.35'))  # weaker vector hits are dropped
+FAQ_DYNAMIC_K_RATIO = float(os.getenv('FAQ_DYNAMIC_K_RATIO', '0.75'))  # entries below this share of the best fused score are dropped
+FAQ_EXACT_SIMILARITY = float(os.getenv('FAQ_EXACT_SIMILARITY', '0.97'))  # from here on the stored answer is returned as is
+FAQ_RRF_K = 60  # reciprocal-rank fusion constant
+
+# Define the answer given without calling the LLM when no FAQ entry is relevant
+FAQ_NO_ANSWER = "I don't know."
+
+# Define expansions of abbreviations that never appear in the FAQ text itself
+QUERY_EXPANSIONS = {
+    'cod': 'cash on delivery',
+}
+
+# Define the result of retrieving FAQ entries for a query: the LLM context, or an answer that needs no LLM
+Retrieval = namedtuple('Retrieval', ['context', 'direct_answer', 'doc_ids'])
+
+# Define the lexical index over the FAQ entries, rebuilt whenever the collection's data changes
+LexicalIndex = namedtuple('LexicalIndex', ['source_hash', 'ids', 'questions', 'answers', 'index'])
+_lexical = None
+_lexical_lock = threading.Lock()
 
-# Initialize sentence embedding function using a pre-trained model
-ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-    model_name="sentence-transformers/all-MiniLM-L6-v2"
+# Initialize semantic cache for FAQ answers (thresholds and bounds configurable via environment)
+faq_cache = SemanticCache(
+    threshold=float(os.getenv('FAQ_CACHE_THRESHOLD', '0.92')),
+    max_size=int(os.getenv('FAQ_CACHE_MAX_SIZE', '1024')),
+    ttl=float(os.getenv('FAQ_CACHE_TTL', '3600')),
 )
 
 
+# Define function returning the shared ChromaDB client, opening it on first call
+def get_chroma_client():
+    global _chroma_client
+    if _chroma_client is None:
+        with _chroma_lock:
+            if _chroma_client is None:
+                import chromadb
+                _chroma_client = chromadb.PersistentClient(path=str(faq_index_path))
+    return _chroma_client
+
+
+# Define function computing a stable ID from the content of one FAQ row
+def faq_row_id(question, answer):
+    digest = hashlib.sha256(f"{question}\x1f{answer}".encode('utf-8')).hexdigest()
+    return f"faq_{digest[:16]}"
+
+
 # Define function to ingest FAQ data into ChromaDB
+# Rows are keyed by content hash, so only added or changed rows are embedded and removed rows are deleted
 def ingest_faq_data(path):
-    # Check if the collection already exists
-    if collection_name_faq not in [c.name for c in chroma_client.list_collections()]:
-        print("Ingesting faq data into Chromadb...")
+    # Read FAQ data from CSV file and key every row by its content hash (pandas is only needed here)
+    import pandas as pd
+    df = pd.read_csv(path)
+    rows = {faq_row_id(q, a): (q, a) for q, a in zip(df['question'], df['answer'])}
+
+    # Version of the FAQ data as a whole: a hash over the set of row hashes
+    source_hash = hashlib.sha256(''.join(sorted(rows)).encode('utf-8')).hexdigest()
+
+    # Open (or create) the persistent collection; embeddings are computed by the shared embedding model
+    model_version = embedding_version()
+    chroma_client = get_chroma_client()
+    collection = chroma_client.get_or_create_collection(
+        name=collection_name_faq,
+        embedding_function=None,
+        metadata={'embedding_model': model_version}
+    )
+    index_metadata = collection.metadata or {}
 
-        # Create new collection with the specified embedding function
-        collection = chroma_client.get_or_create_collection(
+    # Vectors from a different embedding model are not comparable, so rebuild the index from scratch
+    if index_metadata.get('embedding_model') != model_version:
+        print(f"Embedding model changed, rebuilding Chroma collection {collection_name_faq}...")
+        chroma_client.delete_collection(collection_name_faq)
+        collection = chroma_client.create_collection(
             name=collection_name_faq,
-            embedding_function=ef
+            embedding_function=None,
+            metadata={'embedding_model': model_version}
         )
+        index_metadata = collection.metadata or {}
 
-        # Read FAQ data from CSV file
-        df = pd.read_csv(path)
+    # Nothing to do if the index was built from exactly these rows
+    if index_metadata.get('source_hash') == source_hash:
+        print(f"Collection {collection_name_faq} is up to date")
+        return
 
-        # Extract list of questions and corresponding answers
-        docs = df['question'].to_list()
-        metadata = [{'answer': ans} for ans in df['answer'].to_list()]
+    print("Ingesting faq data into Chromadb...")
 
-        # Generate unique IDs for each document
-        ids = [f"id_{i}" for i in range(len(docs))]
+    # Diff the rows in the CSV against the rows already stored in the index
+    existing_ids = set(collection.get(include=[])['ids'])
+    added_ids = [row_id for row_id in rows if row_id not in existing_ids]
+    removed_ids = [row_id for row_id in existing_ids if row_id not in rows]
 
-        # Add data to the ChromaDB collection
-        collection.add(
+    # Embed and upsert only the new or changed rows, in batches
+    for i in range(0, len(added_ids), ingest_batch_size):
+        batch_ids = added_ids[i:i + ingest_batch_size]
+        docs = [rows[row_id][0] for row_id in batch_ids]
+        collection.upsert(
+            ids=batch_ids,
             documents=docs,
-            metadatas=metadata,
-            ids=ids
+            embeddings=encode(docs).tolist(),
+            metadatas=[{'answer': rows[row_id][1]} for row_id in batch_ids]
         )
-        print(f"FAQ data successfully ingested into Chroma collection {collection_name_faq}")
-    else:
-        print(f"Collection {collection_name_faq} already exists")
 
+    # Delete rows that were edited or removed from the CSV
+    for i in range(0, len(removed_ids), ingest_batch_size):
+        collection.delete(ids=removed_ids[i:i + ingest_batch_size])
+
+    # Record which version of the data the index now holds
+    collection.modify(metadata={'embedding_model': model_version, 'source_hash': source_hash})
+    print(
+        f"FAQ data successfully ingested into Chroma collection {collection_name_faq} "
+        f"({len(added_ids)} upserted, {len(removed_ids)} deleted)"
+    )
+
+
+# Define function returning the BM25 index over the questions and answers stored in the collection
+def get_lexical_index(collection):
+    global _lexical
+    source_hash = (collection.metadata or {}).get('source_hash')
+    lexical = _lexical
+    if lexical is None or lexical.source_hash != source_hash:
+        with _lexical_lock:
+            lexical = _lexical
+            if lexical is None or lexical.source_hash != source_hash:
+                rows = collection.get(include=['documents', 'metadatas'])
+                answers = [metadata['answer'] for metadata in rows['metadatas']]
+                index = BM25Index([f"{q} {a}" for q, a in zip(rows['documents'], answers)])
+                lexical = _lexical = LexicalIndex(source_hash, rows['ids'], rows['documents'], answers, index)
+    return lexical
+
+
+# Define function normalising a question for exact matching (case, punctuation and spacing ignored)
+def normalize_question(text):
+    return ' '.join(TOKEN_PATTERN.findall(text.lower()))
+
+
+# Define function appending the expansions of known abbreviations to a query for lexical search
+def expand_query(query):
+    expansions = [QUERY_EXPANSIONS[t] for t in TOKEN_PATTERN.findall(query.lower()) if t in QUERY_EXPANSIONS]
+    return ' '.join([query] + expansions)
+
+
+# Define function fusing the vector hits (one query's slice of a Chroma result) with the BM25 hits
+def fuse(query, ids, distances, questions, metadatas, lexical):
+    entries = {}
+
+    # Vector hits; embeddings are normalised, so the squared L2 distance is 2 - 2 * cosine similarity
+    for rank, (doc_id, distance, question, metadata) in enumerate(zip(ids, distances, questions, metadatas)):
+        similarity = 1 - distance / 2
+        if similarity < FAQ_MIN_SIMILARITY:
+            continue
+        entries[doc_id] = {'question': question, 'answer': metadata['answer'], 'similarity': similarity,
+                           'score': 1 / (FAQ_RRF_K + rank + 1)}
 
-# Define function to retrieve the most relevant Q&A pairs based on query
-def get_relevant_qa(query):
+    # Lexical hits, merged by reciprocal-rank fusion
+    for rank, (position, _) in enumerate(lexical.index.search(expand_query(query), FAQ_CANDIDATES)):
+        doc_id = lexical.ids[position]
+        entry = entries.setdefault(doc_id, {'question': lexical.questions[position], 'answer': lexical.answers[position],
+                                            'similarity': None, 'score': 0.0})
+        entry['score'] += 1 / (FAQ_RRF_K + rank + 1)
+
+    # Nothing relevant: answer without the LLM
+    if not entries:
+        return Retrieval(None, FAQ_NO_ANSWER, [])
+
+    # An exact match of a stored question is answered with its stored answer, without the LLM
+    normalized = normalize_question(query)
+    for doc_id, entry in entries.items():
+        if normalize_question(entry['question']) == normalized:
+            return Retrieval(None, entry['answer'], [doc_id])
+    closest_id, closest = max(entries.items(), key=lambda item: item[1]['similarity'] or 0.0)
+    if (closest['similarity'] or 0.0) >= FAQ_EXACT_SIMILARITY:
+        return Retrieval(None, closest['answer'], [closest_id])
+
+    # Dynamic k: keep the entries scoring close to the best one
+    ranked = sorted(entries.items(), key=lambda item: item[1]['score'], reverse=True)
+    best = ranked[0][1]['score']
+    kept = [(doc_id, entry) for doc_id, entry in ranked if entry['score'] >= FAQ_DYNAMIC_K_RATIO * best][:FAQ_MAX_K]
+    context = '\n\n'.join(f"Q: {entry['question']}\nA: {entry['answer']}" for _, entry in kept)
+    return Retrieval(context, None, [doc_id for doc_id, _ in kept])
+
+
+# Define function to retrieve the most relevant Q&A pairs for a query by hybrid (vector + BM25) search
+# An already computed query vector can be passed to avoid encoding the query again
+def get_relevant_qa(query, vector=None):
     # Fetch the existing FAQ collection
-    collection = chroma_client.get_collection(collection_name_faq)
+    collection = get_chroma_client().get_collection(collection_name_faq)
+
+    # Encode the query only if the caller did not provide its vector
+    if vector is None:
+        vector = embed_query(query)
 
-    # Perform similarity search on query
+    # Perform similarity search on the query vector and fuse it with the lexical search
     result = collection.query(
-        query_texts=[query],
-        n_results=2
+        query_embeddings=[vector.tolist()],
+        n_results=FAQ_CANDIDATES
     )
-    return result
+    return fuse(
+        query, result['ids'][0], result['distances'][0], result['documents'][0], result['metadatas'][0],
+        get_lexical_index(collection),
+    )
+
+
+# Define function retrieving the Q&A pairs of many queries with a single multi-query Chroma call
+def get_relevant_qa_batch(queries, vectors):
+    collection = get_chroma_client().get_collection(collection_name_faq)
+    result = collection.query(
+        query_embeddings=[vector.tolist() for vector in vectors],
+        n_results=FAQ_CANDIDATES
+    )
+    lexical = get_lexical_index(collection)
+    return [
+        fuse(query, *hits, lexical)
+        for query, hits in zip(queries, zip(result['ids'], result['distances'], result['documents'], result['metadatas']))
+    ]
+
 
+# Define coroutine retrieving the relevant FAQ entries for a query
+async def retrieve(query, vector):
+    # Retrieve in a worker thread so the event loop keeps serving other requests
+    with span('faq.retrieve') as retrieve_span:
+        retrieval = await asyncio.to_thread(get_relevant_qa, query, vector)
+        retrieve_span.set_attribute('doc_ids', retrieval.doc_ids)
+    return retrieval
 
-# Define function to handle full FAQ retrieval and answer generation pipeline
-def faq_chain(query):
-    # Retrieve top relevant Q&A entries
-    result = get_relevant_qa(query)
 
-    # Extract context (answers) from metadata
-    context = ''.join([r.get('answer') for r in result['metadatas'][0]])
+# Define coroutine to handle full FAQ retrieval and answer generation pipeline
+# Callers that already retrieved the FAQ entries (e.g. the batch API) pass the retrieval in to skip it, or
+# an already started retrieve() call (speculative execution)
+async def faq_chain(query, vector=None, retrieval=None, pending_retrieval=None):
+    # Encode the query only if the caller did not provide its vector (off the event loop, it is CPU bound)
+    if vector is None:
+        vector = await asyncio.to_thread(embed_query, query)
 
-    # Generate and return final answer using LLM
-    answer = generate_answer(query, context)
+    # Serve a previously generated answer for a semantically equivalent question
+    cached = faq_cache.get(vector)
+    set_attribute('cache_hit', cached is not None)
+    if cached is not None:
+        return cached
+
+    # Retrieve the relevant FAQ entries for the query
+    if retrieval is None:
+        retrieval = await (pending_retrieval if pending_retrieval is not None else retrieve(query, vector))
+    set_attribute('faq_doc_ids', retrieval.doc_ids)
+
+    # Exact matches and queries without any relevant entry are answered without the LLM
+    set_attribute('faq_direct_answer', retrieval.direct_answer is not None)
+    if retrieval.direct_answer is not None:
+        return retrieval.direct_answer
+
+    # Generate final answer using LLM and remember it for similar questions
+    answer = await generate_answer(query, retrieval.context)
+    faq_cache.put(vector, answer)
     return answer
 
 
-# Define function to send query and context to LLM and receive an answer
-def generate_answer(query, context):
+# Define async generator variant of faq_chain that yields the answer token by token
+async def faq_chain_stream(query, vector=None, pending_retrieval=None):
+    # Encode the query only if the caller did not provide its vector
+    if vector is None:
+        vector = await asyncio.to_thread(embed_query, query)
+
+    # A cached answer is complete already, so it is yielded in one piece
+    cached = faq_cache.get(vector)
+    set_attribute('cache_hit', cached is not None)
+    if cached is not None:
+        yield cached
+        return
+
+    # Retrieve the relevant FAQ entries for the query
+    retrieval = await (pending_retrieval if pending_retrieval is not None else retrieve(query, vector))
+    set_attribute('faq_doc_ids', retrieval.doc_ids)
+
+    # Exact matches and queries without any relevant entry are answered without the LLM
+    set_attribute('faq_direct_answer', retrieval.direct_answer is not None)
+    if retrieval.direct_answer is not None:
+        yield retrieval.direct_answer
+        return
+
+    # Stream the answer while collecting it, then remember the full text for similar questions
+    parts = []
+    async for token in generate_answer_stream(query, retrieval.context):
+        parts.append(token)
+        yield token
+    faq_cache.put(vector, ''.join(parts))
+
+
+# Define function building the chat messages for answering a query from its context
+def answer_messages(query, context):
     # Construct prompt for LLM with clear instruction to avoid hallucination
     prompt = f'''
     Given the question and context below, generate the answer based on the context only.
@@ -99,20 +332,26 @@ def generate_answer(query, context):
 
     CONTEXT: {context}
     '''
+    return [
+        {
+            "role": "user",
+            "content": prompt,
+        }
+    ]
+
+
+# Define coroutine to send query and context to LLM and receive an answer
+async def generate_answer(query, context):
+    # Make chat completion request to the shared Groq client and return the generated message content
+    with span('faq.llm'):
+        return await chat(messages=answer_messages(query, context))
 
-    # Make chat completion request to Groq LLM using model defined in environment variables
-    chat_completion = groq_client.chat.completions.create(
-        messages=[
-            {
-                "role": "user",
-                "content": prompt,
-            }
-        ],
-        model=os.environ['GROQ_MODEL'],
-    )
 
-    # Return the generated message content
-    return chat_completion.choices[0].message.content
+# Define async generator to send query and context to LLM and stream the answer
+async def generate_answer_stream(query, context):
+    with span('faq.llm'):
+        async for token in chat_stream(messages=answer_messages(query, context)):
+            yield token
 
 
 # Execute ingestion and querying when script is run directly
@@ -124,5 +363,5 @@ if __name__ == "__main__":
     query = "Do you take cash as a payment option?"
 
     # Get generated answer from pipeline
-    answer = faq_chain(query)
+    answer = run(faq_chain(query))
     print(answer)
@@ -0,0 +1,141 @@
+# Chat history of the Streamlit sessions: each session keeps only a bounded tail of recent messages in memory,
+# while every message is also written to a compact SQLite log from which older turns are paged back in on demand.
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+import zlib
+from collections import deque
+from pathlib import Path
+
+# Define history settings (overridable via environment variables)
+HISTORY_DB_PATH = os.getenv('HISTORY_DB_PATH', str(Path(__file__).parent / 'chat_history.sqlite'))
+# Messages kept in memory (and rendered) per session
+HISTORY_WINDOW = int(os.getenv('HISTORY_WINDOW', '20'))
+# Hard cap on the characters kept in memory per session, however long the messages are
+HISTORY_MAX_CHARS = int(os.getenv('HISTORY_MAX_CHARS', '50000'))
+# Older messages paged in per "show earlier messages" click
+HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', '20'))
+# A session's messages are deleted when the session ends; messages older than this are deleted in any case
+# (e.g. those of a process that crashed), checked at most every HISTORY_PRUNE_INTERVAL seconds
+HISTORY_RETENTION_HOURS = float(os.getenv('HISTORY_RETENTION_HOURS', '24'))
+HISTORY_PRUNE_INTERVAL = float(os.getenv('HISTORY_PRUNE_INTERVAL', '300'))
+# Messages at least this long are stored zlib-compressed
+HISTORY_COMPRESS_MIN_CHARS = 256
+
+# Roles are stored as their index in this tuple
+ROLES = ('user', 'assistant')
+
+# Define the shared log connection (Streamlit runs each session on its own thread)
+_conn = None
+_conn_lock = threading.Lock()
+_log_lock = threading.Lock()
+# When expired messages were last deleted (time.monotonic())
+_last_prune = None
+
+
+# Define function opening the log on first use and creating its table
+def get_log():
+    global _conn
+    with _conn_lock:
+        if _conn is None:
+            conn = sqlite3.connect(HISTORY_DB_PATH, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS message ("
+                "session TEXT, seq INTEGER, role INTEGER, content, created REAL, "
+                "PRIMARY KEY (session, seq)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_message_created ON message (created)")
+            _conn = conn
+        return _conn
+
+
+# Define function deleting expired messages, unless that was done less than HISTORY_PRUNE_INTERVAL seconds ago
+def prune():
+    global _last_prune
+    log = get_log()
+    with _log_lock:
+        now = time.monotonic()
+        if _last_prune is not None and now - _last_prune < HISTORY_PRUNE_INTERVAL:
+            return
+        _last_prune = now
+        log.execute("DELETE FROM message WHERE created < ?", (time.time() - HISTORY_RETENTION_HOURS * 3600,))
+
+
+# Define function deleting the messages of an ended session; nothing to do if the log was never opened
+def delete_session(session_id):
+    if _conn is None:
+        return
+    with _log_lock:
+        _conn.execute("DELETE FROM message WHERE session = ?", (session_id,))
+
+
+# Define functions packing message text for the log: short text as is, long text as a compressed blob
+def pack(content):
+    if len(content) < HISTORY_COMPRESS_MIN_CHARS:
+        return content
+    return zlib.compress(content.encode('utf-8'))
+
+
+def unpack(content):
+    if isinstance(content, bytes):
+        return zlib.decompress(content).decode('utf-8')
+    return content
+
+
+# Define the history of one chat session
+class ChatHistory:
+    def __init__(self, session_id=None, window=HISTORY_WINDOW, max_chars=HISTORY_MAX_CHARS):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.window = window
+        self.max_chars = max_chars
+
+        # Recent messages as (seq, role, content), the characters they hold and the number of messages logged
+        self.tail = deque()
+        self.chars = 0
+        self.count = 0
+
+        # The logged messages are deleted once the session ends and Streamlit drops its session state
+        weakref.finalize(self, delete_session, self.session_id)
+
+    # Append a message to the log and to the in-memory tail, evicting the oldest messages beyond the caps
+    def append(self, role, content):
+        seq = self.count
+        log = get_log()
+        with _log_lock:
+            log.execute(
+                "INSERT INTO message VALUES (?, ?, ?, ?, ?)",
+                (self.session_id, seq, ROLES.index(role), pack(content), time.time()),
+            )
+        self.count += 1
+        prune()
+
+        # A single message longer than the cap is kept truncated; the log holds it in full
+        content = content[:self.max_chars]
+        self.tail.append((seq, role, content))
+        self.chars += len(content)
+        while len(self.tail) > max(self.window, 1) or self.chars > self.max_chars:
+            self.chars -= len(self.tail.popleft()[2])
+
+    # Return the recent messages kept in memory as (role, content), oldest first
+    def recent(self):
+        return [(role, content) for _, role, content in self.tail]
+
+    # Return the number of logged messages older than the in-memory tail
+    def hidden(self):
+        return self.tail[0][0] if self.tail else self.count
+
+    # Read up to limit messages logged just before the in-memory tail from the log as (role, content), oldest first
+    def earlier(self, limit):
+        before = self.hidden()
+        log = get_log()
+        with _log_lock:
+            rows = log.execute(
+                "SELECT role, content FROM message WHERE session = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (self.session_id, max(before - limit, 0), before),
+            ).fetchall()
+        return [(ROLES[role], unpack(content)) for role, content in rows]
@@ -0,0 +1,209 @@
+# Shared asynchronous Groq client used by every chain (faq, sql and small talk).
+# One pooled client per event loop, a bounded concurrency semaphore, timeouts and retry with backoff.
+# Identical concurrent chat requests, streamed or not, are coalesced into one call.
+import asyncio
+import json
+import os
+import queue
+import random
+import threading
+import weakref
+import httpx
+from groq import AsyncGroq, APIConnectionError, APIStatusError, APITimeoutError
+from dotenv import load_dotenv
+from singleflight import SingleFlight
+from tracing import increment
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Define client tuning knobs (overridable via environment variables)
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '16'))
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '30'))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '3'))
+LLM_BACKOFF = float(os.getenv('LLM_BACKOFF', '0.5'))
+LLM_COALESCE = os.getenv('LLM_COALESCE', '1') == '1'
+
+# Concurrent chat requests with the same model, parameters and prompt share one LLM call (streams share theirs)
+llm_flight = SingleFlight('llm', enabled=LLM_COALESCE)
+
+# Per event loop client and semaphore; both are bound to the loop they were first used on
+_loop_resources = weakref.WeakKeyDictionary()
+
+# Background event loop used to run coroutines from synchronous code (Streamlit, scripts)
+_background_loop = None
+_background_lock = threading.Lock()
+
+
+# Define function returning the client and semaphore for the running event loop
+def _resources():
+    loop = asyncio.get_running_loop()
+    resources = _loop_resources.get(loop)
+    if resources is None:
+        # Keep-alive connection pool sized to the concurrency limit
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONCURRENCY,
+                max_keepalive_connections=LLM_MAX_CONCURRENCY,
+            ),
+            timeout=LLM_TIMEOUT,
+        )
+        # Retries are handled below so that they also respect the semaphore
+        client = AsyncGroq(http_client=http_client, timeout=LLM_TIMEOUT, max_retries=0)
+        resources = (client, asyncio.Semaphore(LLM_MAX_CONCURRENCY))
+        _loop_resources[loop] = resources
+    return resources
+
+
+# Define function deciding whether a failed request is worth retrying
+def _is_retryable(error):
+    if isinstance(error, (APITimeoutError, APIConnectionError)):
+        return True
+    return isinstance(error, APIStatusError) and (error.status_code == 429 or error.status_code >= 500)
+
+
+# Define function computing how long to wait before the next attempt
+def _retry_delay(error, attempt):
+    # Honour the server's Retry-After header on rate limits when it is present
+    if isinstance(error, APIStatusError):
+        retry_after = error.response.headers.get('retry-after')
+        try:
+            return float(retry_after)
+        except (TypeError, ValueError):
+            pass
+    # Exponential backoff with jitter
+    return LLM_BACKOFF * (2 ** attempt) * (0.5 + random.random())
+
+
+# Define function adding a response's token usage to the current request trace
+def _record_usage(usage):
+    if usage is not None:
+        increment('llm_prompt_tokens', usage.prompt_tokens or 0)
+        increment('llm_completion_tokens', usage.completion_tokens or 0)
+
+
+# Define function building the coalescing key of a chat request; prompts differing only in whitespace are equal
+def _chat_key(messages, model, params):
+    prompt = tuple((message['role'], ' '.join(message['content'].split())) for message in messages)
+    return model, json.dumps(params, sort_keys=True, default=str), prompt
+
+
+# Define function sending a chat completion request and returning the message content
+# An identical request already in flight is joined instead of sending another one
+async def chat(messages, model=None, **params):
+    model = model or os.environ['GROQ_MODEL']
+    return await llm_flight.do_async(_chat_key(messages, model, params), lambda: _chat(messages, model, params))
+
+
+# Define coroutine sending one chat completion request, retrying transient failures
+async def _chat(messages, model, params):
+    client, semaphore = _resources()
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            async with semaphore:
+                completion = await client.chat.completions.create(
+                    messages=messages,
+                    model=model,
+                    **params
+                )
+            _record_usage(completion.usage)
+            return completion.choices[0].message.content
+        except (APIStatusError, APITimeoutError, APIConnectionError) as error:
+            # Give up on client errors or once the retry budget is spent
+            if not _is_retryable(error) or attempt == LLM_MAX_RETRIES:
+                raise
+            increment('llm_retries')
+            await asyncio.sleep(_retry_delay(error, attempt))
+
+
+# Define async generator streaming the message content of a chat completion as it is generated
+# An identical stream already in flight is joined: its tokens so far are replayed, then the rest follow live
+async def chat_stream(messages, model=None, **params):
+    model = model or os.environ['GROQ_MODEL']
+    tokens = llm_flight.stream(_chat_key(messages, model, params), lambda: _chat_stream(messages, model, params))
+    try:
+        async for token in tokens:
+            yield token
+    finally:
+        await tokens.aclose()
+
+
+# Define async generator streaming one chat completion, retrying transient failures before the first token
+async def _chat_stream(messages, model, params):
+    client, semaphore = _resources()
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        started = False
+        try:
+            async with semaphore:
+                stream = await client.chat.completions.create(
+                    messages=messages,
+                    model=model,
+                    stream=True,
+                    **params
+                )
+                async for chunk in stream:
+                    # Groq reports the token usage on the last chunk
+                    x_groq = getattr(chunk, 'x_groq', None)
+                    if x_groq is not None:
+                        _record_usage(x_groq.usage)
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        started = True
+                        yield delta
+            return
+        except (APIStatusError, APITimeoutError, APIConnectionError) as error:
+            # Tokens already handed to the caller cannot be taken back, so only retry before the first one
+            if started or not _is_retryable(error) or attempt == LLM_MAX_RETRIES:
+                raise
+            increment('llm_retries')
+            await asyncio.sleep(_retry_delay(error, attempt))
+
+
+# Define function returning the background event loop, starting it on first use
+def _get_background_loop():
+    global _background_loop
+    with _background_lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_background_loop.run_forever,
+                name='llm-event-loop',
+                daemon=True,
+            ).start()
+    return _background_loop
+
+
+# Define function running a coroutine to completion from synchronous code
+# All such calls share one event loop, so the pooled connections are reused across requests
+def run(coro):
+    return asyncio.run_coroutine_threadsafe(coro, _get_background_loop()).result()
+
+
+# Define generator iterating an async generator from synchronous code
+# The async generator is driven by one task on the background loop, so context variables
+# (e.g. the request trace) set inside it persist from one item to the next
+def iterate(agen):
+    items = queue.Queue()
+
+    async def pump():
+        try:
+            async for item in agen:
+                items.put((True, item))
+            items.put((False, None))
+        except Exception as error:
+            items.put((False, error))
+        finally:
+            await agen.aclose()
+
+    future = asyncio.run_coroutine_threadsafe(pump(), _get_background_loop())
+    try:
+        while True:
+            more, value = items.get()
+            if not more:
+                if value is not None:
+                    raise value
+                return
+            yield value
+    finally:
+        # Stop the generator (and release its connection) if the consumer stops early
+        future.cancel()
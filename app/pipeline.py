@@ -0,0 +1,196 @@
+# Asynchronous request pipeline: route the user query and dispatch it to the matching chain
+import asyncio
+import os
+import threading
+import time
+from router import preliminary_scores, router
+from embeddings import embed_query, peak_rss_mb
+from faq import faq_chain, faq_chain_stream, get_relevant_qa, retrieve
+from sql import fast_path_applies, generate_sql_query, get_brands, sql_chain, sql_chain_stream
+from smalltalk import talk, talk_stream
+from llm import iterate, run
+from tracing import increment, request, set_attribute, span
+
+# Fallback message when the query does not match any route
+NO_ROUTE_MESSAGE = "Sorry, I didn't understand that."
+
+# Enable speculative execution: FAQ retrieval and, for likely product searches, SQL generation start before
+# the route is known, and the work of the routes that lose is cancelled or discarded (opt-in)
+SPECULATIVE_EXECUTION = os.getenv('SPECULATIVE_EXECUTION', '0') == '1'
+
+# SQL generation is started when the sql route's preliminary score is at least this share of the best route's
+SPECULATIVE_SQL_RATIO = float(os.getenv('SPECULATIVE_SQL_RATIO', '0.8'))
+
+
+# Define a piece of work started speculatively; awaiting it marks it as used
+class SpeculativeTask:
+    def __init__(self, coro):
+        self.task = asyncio.create_task(coro)
+        self.used = False
+
+    def __await__(self):
+        self.used = True
+        return self.task.__await__()
+
+    # Cancel the work if nothing used it; returns 'used', 'discarded' (finished for nothing) or 'cancelled'
+    def settle(self):
+        if self.used:
+            return 'used'
+        if self.task.done() and not self.task.cancelled():
+            # Retrieve a possible error so that asyncio does not report it as unhandled
+            self.task.exception()
+            return 'discarded'
+        self.task.cancel()
+        return 'cancelled'
+
+
+# Define the speculative work of one query; a no-op unless speculative execution is enabled
+class Speculation:
+    def __init__(self, query, enabled=SPECULATIVE_EXECUTION):
+        self.query = query
+        self.enabled = enabled
+        self.tasks = {}
+        if not enabled:
+            return
+
+        # Lexical route scores are available at once, long before the query is encoded; the LLM call generating
+        # the SQL is started when the sql route is a close contender and the fast path will not answer anyway
+        scores = preliminary_scores(query)
+        best = max(scores.values(), default=0.0)
+        if best > 0 and scores.get('sql', 0.0) >= SPECULATIVE_SQL_RATIO * best and not fast_path_applies(query):
+            self.tasks['sql_generation'] = SpeculativeTask(generate_sql_query(query))
+
+    # Start retrieving the FAQ entries as soon as the query vector exists, alongside routing and cache lookups
+    def start_faq_retrieval(self, vector):
+        if self.enabled:
+            self.tasks['faq_retrieval'] = SpeculativeTask(retrieve(self.query, vector))
+
+    # Cancel the work no route used and record the outcome of every speculative task on the request trace
+    def settle(self):
+        if not self.tasks:
+            return
+        outcomes = {name: task.settle() for name, task in self.tasks.items()}
+        set_attribute('speculation', outcomes)
+        for name, outcome in outcomes.items():
+            if name == 'sql_generation' and outcome != 'used':
+                increment('llm_wasted_calls')
+
+
+# Define coroutine encoding the query and classifying it into a route name (None if no route matches)
+async def classify(query, speculation=None):
+    # Encode the query once; the vector is shared by routing, the answer caches and FAQ retrieval.
+    # Encoding is CPU bound, so it runs in a worker thread to keep the event loop free
+    with span('encode'):
+        vector = await asyncio.to_thread(embed_query, query)
+    if speculation is not None:
+        speculation.start_faq_retrieval(vector)
+
+    # Identify the intent route from the query vector; a single dot product, cheap enough to run inline
+    with span('route'):
+        route_result = router(query, vector=vector)
+    route = route_result.name if route_result is not None else None
+    set_attribute('route', route)
+    set_attribute('route_score', route_result.similarity_score if route_result is not None else None)
+    return route, vector
+
+
+# Define main routing logic coroutine that takes user query and routes it
+async def ask_async(query):
+    # Trace the request when a tracing exporter is configured
+    with request('ask', query=query):
+        speculation = Speculation(query)
+        try:
+            # Identify the intent route (category) of the query and answer it
+            route, vector = await classify(query, speculation)
+            return await answer(route, query, vector, speculation=speculation)
+        finally:
+            speculation.settle()
+
+
+# Define coroutine answering a query that was already classified into a route
+# faq_retrieval is the already retrieved FAQ entries, if any (used by the batch API)
+async def answer(route, query, vector, faq_retrieval=None, speculation=None):
+    speculative = speculation.tasks if speculation is not None else {}
+    if route is None:
+        # Return fallback message if no matching route found
+        return NO_ROUTE_MESSAGE
+
+    # Dispatch query to the corresponding handler coroutine based on route
+    if route == 'faq':
+        # Handle FAQ queries by fetching relevant answers using faq_chain
+        return await faq_chain(query, vector, retrieval=faq_retrieval, pending_retrieval=speculative.get('faq_retrieval'))
+    elif route == 'sql':
+        # Handle product-related queries using SQL-based search chain
+        return await sql_chain(query, vector, sql_generation=speculative.get('sql_generation'))
+    elif route == 'small-talk':
+        # Handle casual conversation queries via smalltalk LLM function
+        return await talk(query)
+    else:
+        # Provide placeholder response for any unimplemented routes
+        return f"Route `{route}` not implemented yet."
+
+
+# Define synchronous entry point for callers without an event loop (e.g. the Streamlit script)
+def ask(query):
+    return run(ask_async(query))
+
+
+# Define async generator variant of ask_async that yields the answer token by token
+async def ask_stream_async(query):
+    # Trace the request (until the last token) when a tracing exporter is configured
+    with request('ask_stream', query=query):
+        speculation = Speculation(query)
+        try:
+            # Identify the intent route (category) of the query
+            route, vector = await classify(query, speculation)
+            if route is None:
+                yield NO_ROUTE_MESSAGE
+                return
+
+            # Pick the streaming handler for the route
+            if route == 'faq':
+                stream = faq_chain_stream(query, vector, pending_retrieval=speculation.tasks.get('faq_retrieval'))
+            elif route == 'sql':
+                stream = sql_chain_stream(query, vector, sql_generation=speculation.tasks.get('sql_generation'))
+            elif route == 'small-talk':
+                stream = talk_stream(query)
+            else:
+                yield f"Route `{route}` not implemented yet."
+                return
+
+            async for token in stream:
+                yield token
+        finally:
+            speculation.settle()
+
+
+# Define synchronous generator for callers without an event loop (e.g. st.write_stream)
+def ask_stream(query):
+    return iterate(ask_stream_async(query))
+
+
+# Define function loading everything a first request would otherwise load lazily
+# The FAQ data must already be ingested
+def warm_up():
+    start = time.perf_counter()
+    vector = embed_query("warm up")  # embedding model
+    router("warm up", vector=vector)  # route matrix
+    get_relevant_qa("warm up", vector)  # Chroma client, collection and BM25 index
+    get_brands()  # SQLite connection pool
+    print(f"Warmed up in {time.perf_counter() - start:.2f}s (peak RSS {peak_rss_mb():.0f} MB)")
+
+
+# Define function warming up in a daemon thread so the caller can serve or render meanwhile
+# Returns an event that is set once warm-up succeeded
+def start_warm_up():
+    done = threading.Event()
+
+    def target():
+        try:
+            warm_up()
+            done.set()
+        except Exception as e:
+            print(f"Warm-up failed: {type(e).__name__}: {e}")
+
+    threading.Thread(target=target, name='warm-up', daemon=True).start()
+    return done
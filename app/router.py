@@ -1,12 +1,31 @@
-# Import necessary classes and functions from semantic_router
-from semantic_router import Route
-from semantic_router.routers import SemanticRouter
-from semantic_router.encoders import HuggingFaceEncoder
-
-# Initialize Hugging Face encoder using a pre-trained sentence transformer model
-encoder = HuggingFaceEncoder(
-    name="sentence-transformers/all-MiniLM-L6-v2"
-)
+# Intent router: classifies a query into the faq, sql or small-talk route by comparing its embedding
+# with the embeddings of sample utterances of every route.
+import hashlib
+import json
+import os
+import threading
+from collections import namedtuple
+from pathlib import Path
+import numpy as np
+from embeddings import EMBEDDING_MODEL, embedding_version, encode, embed_query
+from bm25 import BM25Index
+
+# Define which router implementation is used: 'vector' (precomputed utterance matrix, default)
+# or 'semantic-router' (the semantic_router library, which encodes the utterances at every startup)
+ROUTER_BACKEND = os.getenv('ROUTER_BACKEND', 'vector')
+
+# Define the routing decision parameters (the same as the semantic_router defaults used before)
+ROUTER_SCORE_THRESHOLD = float(os.getenv('ROUTER_SCORE_THRESHOLD', '0.5'))
+ROUTER_TOP_K = int(os.getenv('ROUTER_TOP_K', '5'))
+
+# Define where the precomputed utterance embeddings are stored (overridable via environment)
+router_index_path = Path(os.getenv('ROUTER_INDEX_PATH', Path(__file__).parent / "router_index"))
+
+# Define a route: a name, sample utterances and optionally a score threshold of its own
+Route = namedtuple('Route', ['name', 'utterances', 'score_threshold'], defaults=[None])
+
+# Define the result of routing one query (name is None if no route matched)
+RouteChoice = namedtuple('RouteChoice', ['name', 'similarity_score'], defaults=[None, None])
 
 # Define a route for FAQ-related queries with a list of sample utterances
 faq = Route(
@@ -42,11 +61,6 @@ faq = Route(
 sql = Route(
     name='sql',
     utterances=[
-        "I want to buy nike shoes that have 50% discount.",
-        "Are there any shoes under Rs. 3000?",
-        "Do you have formal shoes in size 9?",
-        "Are there any Puma shoes on sale?",
-        "What is the price of puma running shoes?",
         "I want to buy nike shoes that have 50% discount.",
         "Are there any shoes under Rs. 3000?",
         "Do you have formal shoes in size 9?",
@@ -82,13 +96,221 @@ small_talk = Route(
     ]
 )
 
-# Initialize the semantic router with defined routes and the sentence encoder
-# Enable local auto-sync for route vector storage
-router = SemanticRouter(
-    routes=[faq, sql, small_talk],
-    encoder=encoder,
-    auto_sync="local",
-)
+# Define the routes in the order they are considered
+routes = [faq, sql, small_talk]
+
+
+# Define function returning the score a route must reach: its own threshold, else the router's, else none at all.
+# A threshold of 0.0 is a real threshold (cosine scores can be negative)
+def route_threshold(threshold, default):
+    if threshold is None:
+        threshold = default
+    return -np.inf if threshold is None else threshold
+
+
+# Define function scoring every query vector against the utterance embeddings and picking a route for each.
+# Each route is scored by aggregating its scores among the top_k closest utterances, and the best scoring
+# route that passes its threshold wins. Returns (route name or None, score) pairs
+def score_routes(vectors, utterances, utterance_routes, route_names, thresholds, top_k=ROUTER_TOP_K, aggregation='mean'):
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+
+    # Cosine similarity of every query with every route utterance (utterance rows are normalised already)
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    similarities = vectors @ utterances.T
+
+    # Scores and routes of the top_k closest utterances of every query
+    top_k = min(top_k, similarities.shape[1])
+    top = np.argpartition(similarities, -top_k, axis=1)[:, -top_k:]
+    top_scores = np.take_along_axis(similarities, top, axis=1)
+    top_routes = utterance_routes[top]
+
+    # Aggregate the scores of each route (routes absent from a query's top_k get -inf)
+    scores = np.full((len(vectors), len(route_names)), -np.inf, dtype=np.float32)
+    for j, name in enumerate(route_names):
+        mask = top_routes == name
+        counts = mask.sum(axis=1)
+        if aggregation == 'max':
+            aggregated = np.where(mask, top_scores, -np.inf).max(axis=1)
+        else:
+            aggregated = np.where(mask, top_scores, 0.0).sum(axis=1)
+            if aggregation == 'mean':
+                aggregated = aggregated / np.maximum(counts, 1)
+        scores[:, j] = np.where(counts > 0, aggregated, -np.inf)
+
+    # Pick the best passing route of every query
+    passed = (scores >= thresholds) & np.isfinite(scores)
+    best = np.where(passed, scores, -np.inf).argmax(axis=1)
+    results = []
+    for i, j in enumerate(best):
+        if passed[i, j]:
+            results.append((route_names[j], float(scores[i, j])))
+        else:
+            results.append((None, None))
+    return results
+
+
+# Define function hashing the route utterances and embedding model; the utterance matrix is only valid for this hash
+def routes_hash(routes):
+    definition = json.dumps({
+        'embedding_model': embedding_version(),
+        'routes': [[route.name, list(route.utterances)] for route in routes],
+    })
+    return hashlib.sha256(definition.encode('utf-8')).hexdigest()[:16]
+
+
+# Define a router classifying with a dot product against a precomputed, memory-mapped utterance matrix
+class VectorRouter:
+    def __init__(self, routes, score_threshold=ROUTER_SCORE_THRESHOLD, top_k=ROUTER_TOP_K, index_path=router_index_path):
+        self.routes = routes
+        self.top_k = top_k
+        self.route_names = [route.name for route in routes]
+        self.utterance_routes = np.array([route.name for route in routes for _ in route.utterances])
+        # A route without a threshold of its own uses the router's; no threshold at all always passes
+        self.thresholds = np.array([
+            route_threshold(route.score_threshold, score_threshold) for route in routes
+        ], dtype=np.float32)
+        self.index_path = Path(index_path)
+        self.path = None
+        self._utterances = None
+        self._lock = threading.Lock()
+
+    # Return the utterance matrix, encoding and saving it first if the routes changed since it was built
+    @property
+    def utterances(self):
+        if self._utterances is None:
+            with self._lock:
+                if self._utterances is None:
+                    self.path = self.index_path / f"routes-{routes_hash(self.routes)}.npy"
+                    if not self.path.exists():
+                        self._build()
+                    # Memory-mapped: opening it is instant and the pages are shared between processes
+                    self._utterances = np.load(self.path, mmap_mode='r')
+        return self._utterances
+
+    # Encode every utterance once and save the normalised matrix, replacing matrices of older route definitions
+    def _build(self):
+        print(f"Encoding route utterances into {self.path}...")
+        matrix = encode([u for route in self.routes for u in route.utterances]).astype(np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+
+        # Write to a temporary file first so a concurrent reader never sees a partial matrix
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            np.save(f, matrix)
+        os.replace(tmp_path, self.path)
+        for old in self.path.parent.glob('routes-*.npy'):
+            if old != self.path:
+                old.unlink(missing_ok=True)
+
+    # Classify many query vectors at once; returns (route name or None, score) pairs
+    def classify_vectors(self, vectors):
+        return score_routes(
+            vectors, self.utterances, self.utterance_routes, self.route_names, self.thresholds, self.top_k
+        )
+
+    # Classify one query; pass its vector to skip encoding it again
+    def __call__(self, text=None, vector=None):
+        if vector is None:
+            if text is None:
+                raise ValueError("Either text or vector must be provided")
+            vector = embed_query(text)
+        name, score = self.classify_vectors(vector)[0]
+        return RouteChoice(name=name, similarity_score=score)
+
+
+# Define function building the semantic_router based router (kept as an alternative backend)
+def build_semantic_router(routes):
+    # Import here so that the default backend does not load semantic_router and its dependencies
+    from semantic_router import Route as SemanticRoute
+    from semantic_router.routers import SemanticRouter
+    from semantic_router.encoders import DenseEncoder
+
+    # Define an encoder that delegates to the shared embedding model instead of loading its own copy
+    class SharedEncoder(DenseEncoder):
+        name: str = EMBEDDING_MODEL
+        type: str = "huggingface"
+        score_threshold: float = ROUTER_SCORE_THRESHOLD
+
+        # Encode a batch of documents into a list of embedding vectors
+        def __call__(self, docs):
+            return encode(docs).tolist()
+
+        # Async variant required by the encoder interface; encoding itself is CPU bound
+        async def acall(self, docs):
+            return self(docs)
+
+    # Initialize the semantic router with defined routes and the shared encoder
+    # Enable local auto-sync for route vector storage
+    return SemanticRouter(
+        routes=[SemanticRoute(name=r.name, utterances=r.utterances, score_threshold=r.score_threshold) for r in routes],
+        encoder=SharedEncoder(),
+        auto_sync="local",
+        top_k=ROUTER_TOP_K,
+    )
+
+
+# Define a wrapper giving the semantic_router based router the same interface as VectorRouter
+class SemanticRouterBackend:
+    def __init__(self, routes):
+        self.routes = routes
+        self._router = None
+        self._lock = threading.Lock()
+
+    # Return the semantic router, building it (which encodes every utterance) on first use
+    @property
+    def router(self):
+        if self._router is None:
+            with self._lock:
+                if self._router is None:
+                    self._router = build_semantic_router(self.routes)
+        return self._router
+
+    # Classify many query vectors at once against the semantic router's own index
+    def classify_vectors(self, vectors):
+        index = self.router.index
+        utterances = np.asarray(index.index, dtype=np.float32)
+        utterances = utterances / np.linalg.norm(utterances, axis=1, keepdims=True)
+        thresholds = np.array([
+            route_threshold(r.score_threshold, self.router.score_threshold) for r in self.router.routes
+        ], dtype=np.float32)
+        return score_routes(
+            vectors, utterances, np.asarray(index.routes), [r.name for r in self.router.routes],
+            thresholds, self.router.top_k, self.router.aggregation,
+        )
+
+    # Classify one query; pass its vector to skip encoding it again
+    def __call__(self, text=None, vector=None):
+        choice = self.router(text, vector=vector)
+        return RouteChoice(name=choice.name, similarity_score=choice.similarity_score)
+
+
+# Initialize the router for the configured backend
+if ROUTER_BACKEND == 'semantic-router':
+    router = SemanticRouterBackend(routes)
+else:
+    router = VectorRouter(routes)
+
+
+# Define function classifying many query vectors at once; returns (route name or None, score) pairs
+def classify_vectors(vectors):
+    return router.classify_vectors(vectors)
+
+
+# Define a BM25 index over the route utterances for preliminary, lexical route scores
+utterance_index = BM25Index([u for route in routes for u in route.utterances])
+utterance_route_names = [route.name for route in routes for _ in route.utterances]
+
+
+# Define function scoring the routes lexically, before (and much faster than) encoding the query;
+# a route's score is the BM25 score of its best matching utterance, routes without any shared word are absent
+def preliminary_scores(text):
+    scores = {}
+    for position, score in utterance_index.search(text, ROUTER_TOP_K):
+        name = utterance_route_names[position]
+        scores[name] = max(scores.get(name, 0.0), score)
+    return scores
+
 
 # Run classification examples when the script is executed directly
 if __name__ == "__main__":
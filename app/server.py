@@ -0,0 +1,132 @@
+# HTTP API serving the chatbot to the Streamlit UI and to other services, with several worker processes.
+# The parent process brings the database schema, FAQ index and route matrix up to date once; every worker
+# then loads the embedding model and warms the indexes, before it accepts requests or, with
+# SERVER_WARMUP=background, while it already answers /health (and reports /ready once done).
+#
+# Usage:
+#     python server.py [--host 127.0.0.1] [--port 8000] [--workers 4]
+# Endpoints:
+#     POST /ask          {"query": "..."} -> {"answer": "..."}
+#     POST /ask/stream   {"query": "..."} -> server-sent events: {"token": "..."} per token, then a "done" event
+#     GET  /health       200 while the worker is running
+#     GET  /ready        200 once the worker is warmed up, 503 before
+#     GET  /metrics      Prometheus metrics of the worker answering the scrape (TRACING_EXPORTERS=prometheus)
+import argparse
+import json
+import os
+import threading
+from contextlib import asynccontextmanager
+from pathlib import Path
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from db import migrate
+from router import VectorRouter, router
+from faq import ingest_faq_data
+from pipeline import ask_async, ask_stream_async, start_warm_up, warm_up
+from tracing import metrics
+
+# Define server settings (overridable via environment variables)
+SERVER_HOST = os.getenv('SERVER_HOST', '127.0.0.1')
+SERVER_PORT = int(os.getenv('SERVER_PORT', '8000'))
+SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', '1'))
+MAX_QUERY_LENGTH = int(os.getenv('MAX_QUERY_LENGTH', '1000'))
+SERVER_WARMUP = os.getenv('SERVER_WARMUP', 'blocking')  # 'blocking' or 'background'
+
+# Define the FAQ data served by the bot
+faqs_path = Path(__file__).parent.parent / "resources" / "faq_data.csv"
+
+# Set once this worker finished warming up
+warmed_up = threading.Event()
+
+
+# Define the request body of both ask endpoints
+class Query(BaseModel):
+    query: str = Field(min_length=1, max_length=MAX_QUERY_LENGTH)
+
+
+# Define function bringing the database schema and the shared on-disk indexes up to date; run once, before the
+# workers start, so that workers never write the database or the FAQ index concurrently
+def prepare():
+    migrate()
+    ingest_faq_data(faqs_path)
+    if isinstance(router, VectorRouter):
+        router.utterances
+
+
+# Define the worker lifecycle: warm up before serving, or in the background while serving
+@asynccontextmanager
+async def lifespan(app):
+    global warmed_up
+    if SERVER_WARMUP == 'background':
+        warmed_up = start_warm_up()
+    else:
+        warm_up()
+        warmed_up.set()
+    yield
+
+
+app = FastAPI(title="E-Commerce Bot", lifespan=lifespan)
+
+
+# Define endpoint answering a query in one response
+@app.post('/ask')
+async def ask_endpoint(body: Query):
+    return {'answer': await ask_async(body.query)}
+
+
+# Define generator turning the answer stream into server-sent events
+async def answer_events(query):
+    try:
+        async for token in ask_stream_async(query):
+            yield f"data: {json.dumps({'token': token})}\n\n"
+    except Exception as e:
+        # The status code is already sent, so the failure is reported in the stream
+        print(f"Streaming answer failed: {type(e).__name__}: {e}")
+        yield f"event: error\ndata: {json.dumps({'error': type(e).__name__})}\n\n"
+        return
+    yield "event: done\ndata: {}\n\n"
+
+
+# Define endpoint streaming the answer token by token as server-sent events
+@app.post('/ask/stream')
+async def ask_stream_endpoint(body: Query):
+    return StreamingResponse(
+        answer_events(body.query),
+        media_type='text/event-stream',
+        headers={'cache-control': 'no-cache', 'x-accel-buffering': 'no'},
+    )
+
+
+# Define liveness endpoint
+@app.get('/health')
+async def health():
+    return {'status': 'ok'}
+
+
+# Define readiness endpoint for load balancers and orchestrators
+@app.get('/ready')
+async def readiness():
+    if not warmed_up.is_set():
+        return JSONResponse({'status': 'warming up'}, status_code=503)
+    return {'status': 'ready'}
+
+
+# Define endpoint exposing the metrics in the Prometheus text format
+@app.get('/metrics')
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description='Serve the chatbot over HTTP.')
+    parser.add_argument('--host', default=SERVER_HOST, help='Interface to listen on')
+    parser.add_argument('--port', type=int, default=SERVER_PORT, help='Port to listen on')
+    parser.add_argument('--workers', type=int, default=SERVER_WORKERS, help='Worker processes')
+    args = parser.parse_args()
+
+    prepare()
+    uvicorn.run('server:app', host=args.host, port=args.port, workers=args.workers,
+                app_dir=str(Path(__file__).parent))
@@ -0,0 +1,198 @@
+# Single-flight request coalescing: concurrent calls with the same key share one in-flight computation (or stream).
+# Unlike the semantic answer caches, nothing is kept once the computation finishes; this only collapses the
+# bursts of identical LLM calls and SQL queries that many users asking the same question at once produce.
+import asyncio
+import threading
+import weakref
+from concurrent.futures import Future
+from tracing import increment
+
+
+# Define a coalescing group for synchronous callers (threads) and asynchronous callers (coroutines)
+class SingleFlight:
+    def __init__(self, name, enabled=True):
+        # Name of the trace counter incremented whenever a caller shares another caller's computation
+        self.name = name
+        self.enabled = enabled
+
+        # Counters for monitoring: calls made and calls served by another caller's computation
+        self.calls = 0
+        self.shared = 0
+
+        self._lock = threading.Lock()
+        # In-flight computations of synchronous callers: key -> Future
+        self._futures = {}
+        # In-flight computations of asynchronous callers, per event loop (tasks belong to one loop): loop -> {key: Task}
+        self._tasks = weakref.WeakKeyDictionary()
+        # In-flight streams, per event loop: loop -> {key: _Broadcast}
+        self._streams = weakref.WeakKeyDictionary()
+
+    # Return fn(), or the result of the identical call already running in another thread
+    def do(self, key, fn):
+        with self._lock:
+            self.calls += 1
+        if not self.enabled:
+            return fn()
+        with self._lock:
+            future = self._futures.get(key)
+            leader = future is None
+            if leader:
+                future = self._futures[key] = Future()
+            else:
+                self.shared += 1
+
+        # Followers wait for the leader's result (or its exception)
+        if not leader:
+            increment(f'{self.name}_coalesced')
+            return future.result()
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._futures[key]
+
+    # Return await coro_fn(), or the result of the identical call already running on this event loop
+    async def do_async(self, key, coro_fn):
+        with self._lock:
+            self.calls += 1
+        if not self.enabled:
+            return await coro_fn()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            tasks = self._tasks.setdefault(loop, {})
+            # [task, number of callers waiting for it]
+            flight = tasks.get(key)
+            shared = flight is not None
+            if shared:
+                self.shared += 1
+            else:
+                flight = tasks[key] = [loop.create_task(coro_fn()), 0]
+                flight[0].add_done_callback(lambda task: self._finish(tasks, key, task))
+            flight[1] += 1
+        if shared:
+            increment(f'{self.name}_coalesced')
+
+        # A cancelled caller stops waiting; the computation itself is only cancelled with its last caller
+        try:
+            return await asyncio.shield(flight[0])
+        except asyncio.CancelledError:
+            with self._lock:
+                flight[1] -= 1
+                abandoned = flight[1] == 0
+                # Later callers start afresh instead of joining the cancelled computation
+                if abandoned and tasks.get(key) is flight:
+                    del tasks[key]
+            if abandoned:
+                flight[0].cancel()
+            raise
+
+    # Yield the items of agen_fn(), or of the identical stream already running on this event loop; a caller that
+    # joins late first gets the items produced so far, then the rest as they arrive
+    async def stream(self, key, agen_fn):
+        with self._lock:
+            self.calls += 1
+        if not self.enabled:
+            agen = agen_fn()
+            try:
+                async for item in agen:
+                    yield item
+            finally:
+                await agen.aclose()
+            return
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            streams = self._streams.setdefault(loop, {})
+            flight = streams.get(key)
+            # A stream that already ended (its done callback has not run yet) is not joined
+            shared = flight is not None and not flight.done
+            if shared:
+                self.shared += 1
+            else:
+                flight = streams[key] = _Broadcast()
+                flight.task = loop.create_task(flight.pump(agen_fn()))
+                flight.task.add_done_callback(lambda task: self._finish_stream(streams, key, flight))
+            flight.waiters += 1
+        if shared:
+            increment(f'{self.name}_coalesced')
+
+        try:
+            position = 0
+            while True:
+                async with flight.changed:
+                    await flight.changed.wait_for(lambda: position < len(flight.items) or flight.done)
+                    items = flight.items[position:]
+                    done = flight.done
+                position += len(items)
+                for item in items:
+                    yield item
+                if done:
+                    break
+            if flight.error is not None:
+                raise flight.error
+        finally:
+            # Like do_async, the stream itself is only cancelled when its last caller stops reading
+            with self._lock:
+                flight.waiters -= 1
+                abandoned = flight.waiters == 0 and not flight.done
+                if abandoned and streams.get(key) is flight:
+                    del streams[key]
+            if abandoned:
+                flight.task.cancel()
+
+    # Forget a finished stream
+    def _finish_stream(self, streams, key, flight):
+        with self._lock:
+            if streams.get(key) is flight:
+                del streams[key]
+
+    # Forget a finished computation; its error is marked as retrieved in case every caller stopped waiting
+    def _finish(self, tasks, key, task):
+        with self._lock:
+            flight = tasks.get(key)
+            if flight is not None and flight[0] is task:
+                del tasks[key]
+        if not task.cancelled():
+            task.exception()
+
+    # Return counters describing how much work was shared
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'shared': self.shared,
+                'in_flight': len(self._futures) + sum(len(tasks) for tasks in self._tasks.values())
+                + sum(len(streams) for streams in self._streams.values()),
+            }
+
+
+# Define the shared state of one coalesced stream: the items produced so far, whether it ended and how
+class _Broadcast:
+    def __init__(self):
+        self.items = []
+        self.done = False
+        self.error = None
+        self.waiters = 0
+        self.task = None
+        self.changed = asyncio.Condition()
+
+    # Read the stream to the end, publishing every item (and the error it ends with, if any) to the readers
+    async def pump(self, agen):
+        try:
+            async for item in agen:
+                async with self.changed:
+                    self.items.append(item)
+                    self.changed.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            await agen.aclose()
+            self.done = True
+            async with self.changed:
+                self.changed.notify_all()
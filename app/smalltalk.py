@@ -1,34 +1,33 @@
 # Import necessary modules
-import os
-from groq import Groq
-from dotenv import load_dotenv
+from llm import chat, chat_stream
+from tracing import span
 
-# Load environment variables from .env file
-load_dotenv()
+# Define a function building the chat messages for a small talk query
+def talk_messages(query):
+    return [
+        {
+            'role': 'system',
+            'content': ( # Role assigned to the LLM for conversational topics
+                "You are a friendly and conversational assistant designed for small talk. "
+                "You can answer questions about the weather, your name, your purpose, and more. "
+                "If you don’t know something, just say 'I don’t know' instead of making it up."
+            )
+        },
+        {
+            'role': 'user',
+            'content': query  # User's input question or message
+        }
+    ]
 
-# Initialize the Groq LLM client
-groq_client = Groq()
-
-# Define a function to interact with the LLM for small talk
-def talk(query):
+# Define a coroutine to interact with the LLM for small talk
+async def talk(query):
     # Create a chat completion request using the provided query and system instructions
-    completion = groq_client.chat.completions.create(
-        model=os.environ['GROQ_MODEL'],  # Use the model name from environment variables
-        messages=[
-            {
-                'role': 'system',
-                'content': ( # Role assigned to the LLM for conversational topics
-                    "You are a friendly and conversational assistant designed for small talk. "
-                    "You can answer questions about the weather, your name, your purpose, and more. "
-                    "If you don’t know something, just say 'I don’t know' instead of making it up."
-                )
-            },
-            {
-                'role': 'user',
-                'content': query  # User's input question or message
-            }
-        ]
-    )
+    # and return the LLM's response content
+    with span('smalltalk.llm'):
+        return await chat(messages=talk_messages(query))
 
-    # Return the LLM's response content
-    return completion.choices[0].message.content
+# Define an async generator streaming the small talk response token by token
+async def talk_stream(query):
+    with span('smalltalk.llm'):
+        async for token in chat_stream(messages=talk_messages(query)):
+            yield token
@@ -1,10 +1,15 @@
-import sqlite3
-import pandas as pd
-from groq import Groq
+import asyncio
 import os
 import re
-from pathlib import Path
+import sqlite3
 from dotenv import load_dotenv
+from db import db_version, get_pool
+from embeddings import embed_query
+from cache import SemanticCache
+from llm import chat, chat_stream, run
+from sql_parser import parse_question, build_query, compact_link, render_answer
+from singleflight import SingleFlight
+from tracing import set_attribute, span
 
 # Load environment variables from .env file
 load_dotenv()
@@ -12,11 +17,112 @@ load_dotenv()
 # Retrieve the Groq model name from environment variables
 GROQ_MODEL = os.getenv('GROQ_MODEL')
 
-# Define path to the SQLite database file
-db_path = Path(__file__).parent / "db.sqlite"
+# Initialize semantic cache for SQL answers; a stricter default threshold than FAQ answers
+# since product questions that differ by a single word can need different results
+sql_cache = SemanticCache(
+    threshold=float(os.getenv('SQL_CACHE_THRESHOLD', '0.97')),
+    max_size=int(os.getenv('SQL_CACHE_MAX_SIZE', '1024')),
+    ttl=float(os.getenv('SQL_CACHE_TTL', '600')),
+)
+
+
+# Define bounds on the query result passed to data comprehension (overridable via environment variables)
+SQL_MAX_ROWS = int(os.getenv('SQL_MAX_ROWS', '25'))
+SQL_CONTEXT_TOKENS = int(os.getenv('SQL_CONTEXT_TOKENS', '2000'))
+
+# Columns used by the answer format; other columns of product rows are dropped before comprehension
+ANSWER_COLUMNS = ['title', 'price', 'discount', 'avg_rating', 'product_link']
+
+
+# Define function returning the note shown to the user when only part of the results is listed
+def truncation_notice(shown):
+    return f"\n\n_Showing the first {shown} matching products. Add more details to your question to narrow down the results._"
+
+
+# Concurrent executions of the same SQL query (same text up to whitespace outside literals, same parameters) or of
+# the fast path for the same question share one result
+SQL_COALESCE = os.getenv('SQL_COALESCE', '1') == '1'
+sql_flight = SingleFlight('sql', enabled=SQL_COALESCE)
+
+# Enable the rule-based fast path that answers formulaic product questions without the LLM
+SQL_FAST_PATH = os.getenv('SQL_FAST_PATH', '1') == '1'
+
+# Brand names (lower-cased -> value stored in the product table) and the database version they were read at
+_brands = (None, {})
+
+
+# Define function returning the distinct brands in the product table, re-read whenever the database changes
+def get_brands():
+    global _brands
+    version = db_version()
+    if _brands[0] != version:
+        _, rows = get_pool().query("SELECT DISTINCT brand FROM product WHERE brand IS NOT NULL")
+        _brands = (version, {brand.strip().lower(): brand for (brand,) in rows if brand.strip()})
+    return _brands[1]
+
+
+# Define function answering a question with the rule-based parser, or returning None if it needs the LLM
+def fast_path_answer(question):
+    parsed = parse_question(question, get_brands())
+    if parsed is None:
+        return None
+
+    # Run the parameterized query and render the rows with the answer template
+    query, params = build_query(parsed)
+    set_attribute('sql', query)
+    set_attribute('sql_params', list(params))
+    _, rows, truncated = query_bounded(query, params)
+    set_attribute('sql_rows', len(rows))
+    answer = render_answer(rows)
+    return answer + truncation_notice(len(rows)) if truncated else answer
+
+
+# Define coroutine running the fast path in a worker thread; identical questions in flight share one run
+async def run_fast_path(question):
+    key = ('fast_path', ' '.join(question.lower().split()))
+    return await sql_flight.do_async(key, lambda: asyncio.to_thread(fast_path_answer, question))
+
+
+# Define function telling whether the fast path will answer a question, i.e. no SQL generation is needed.
+# It uses the brands already loaded (by warm-up or an earlier question) and never touches the database,
+# so it is cheap enough to call on the event loop
+def fast_path_applies(question):
+    return SQL_FAST_PATH and parse_question(question, _brands[1]) is not None
+
+
+# Define function extracting the numbers in a question; cached answers only match on identical numbers
+def numeric_tag(question):
+    return tuple(re.findall(r'\d+(?:\.\d+)?', question))
+
+
+# Define function formatting one cell of the compact result table
+def format_value(column, value):
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        return f"{value:g}"
+    if column == 'product_link':
+        return compact_link(value)
+    return str(value).replace('|', '/').replace('\n', ' ')
+
+
+# Define function serializing result rows as a compact '|' separated table within a token budget
+# Returns the table and the number of rows it holds; tokens are estimated at ~4 characters each
+def serialize_rows(columns, rows, token_budget=SQL_CONTEXT_TOKENS):
+    # Keep only the columns the answer format uses, unless the result has none of them (e.g. aggregates)
+    keep = [i for i, column in enumerate(columns) if column in ANSWER_COLUMNS] or list(range(len(columns)))
 
-# Initialize Groq client for calling the LLM
-client_sql = Groq()
+    lines = ['|'.join(columns[i] for i in keep)]
+    used = len(lines[0]) // 4 + 1
+    for row in rows:
+        line = '|'.join(format_value(columns[i], row[i]) for i in keep)
+        cost = len(line) // 4 + 1
+        # Always include at least one row, then stop once the budget is spent
+        if len(lines) > 1 and used + cost > token_budget:
+            break
+        lines.append(line)
+        used += cost
+    return '\n'.join(lines), len(lines) - 1
 
 # Define the system prompt instructing the LLM on how to generate SQL queries
 sql_prompt = """You are an expert in understanding the database schema and generating SQL queries for a natural language question asked
@@ -37,15 +143,17 @@ total_ratings - integer (total number of ratings for the product)
 Make sure whenever you try to search for the brand name, the name can be in any case. 
 So, make sure to use %LIKE% to find the brand in condition. Never use "ILIKE". 
 Create a single SQL query for the question provided. 
-The query should have all the fields in SELECT clause (i.e. SELECT *)
+When listing products, select only the title, price, discount, avg_rating and product_link fields, 
+plus any other field or aggregate the question asks about. Never use SELECT *.
 
 Just the SQL query is needed, nothing more. Always provide the SQL in between the <SQL></SQL> tags.
 """
 
-# Define function to generate SQL query from natural language question using LLM
-def generate_sql_query(question):
+# Define coroutine to generate SQL query from natural language question using LLM
+async def generate_sql_query(question):
     # Send chat completion request with system prompt and user question
-    chat_completion = client_sql.chat.completions.create(
+    # and return the full text response (includes <SQL> tags with the query)
+    return await chat(
         messages=[
             {
                 "role": "system",
@@ -56,28 +164,48 @@ def generate_sql_query(question):
                 "content": question,  # User's natural language question
             }
         ],
-        model=os.environ['GROQ_MODEL'],
         temperature=0.2,  # Low temperature to reduce creativity in SQL generation
         max_tokens=1024
     )
 
-    # Return the full text response (includes <SQL> tags with the query)
-    return chat_completion.choices[0].message.content
+# Matches the string literals and quoted identifiers of a SQL query
+SQL_QUOTED = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
 
-# Define function to run a SQL query against the SQLite database and return results as DataFrame
-def run_query(query):
+
+# Define function returning the coalescing key of a SQL query: its text up to whitespace outside quoted literals
+# (whitespace inside them changes the query) and its parameters
+def sql_key(query, params=()):
+    parts = SQL_QUOTED.split(query)
+    parts[::2] = [re.sub(r'\s+', ' ', part) for part in parts[::2]]
+    return ''.join(parts).strip(), tuple(params)
+
+
+# Define function running a read-only query with the row cap applied; returns columns, rows and whether more rows matched
+# An identical query already running in another thread is joined instead of executed again
+def query_bounded(query, params=()):
+    return sql_flight.do(sql_key(query, params), lambda: get_pool().query_bounded(query, params, max_rows=SQL_MAX_ROWS))
+
+
+# Define function to run a SQL query against the SQLite database
+# Returns column names, at most SQL_MAX_ROWS row tuples and whether more rows matched
+def run_query(query, params=()):
     # Validate the generated query starts with SELECT to prevent unwanted queries
     if query.strip().upper().startswith('SELECT'):
-        # Connect to SQLite DB using a context manager
-        with sqlite3.connect(db_path) as conn:
-            # Execute the SQL query and fetch results into a pandas DataFrame
-            df = pd.read_sql_query(query, conn)
-            return df
+        try:
+            # Execute the SQL query on a pooled read-only connection with the row cap applied
+            return query_bounded(query, params)
+        except sqlite3.Error as e:
+            print("SQL ERROR:", e)
+            set_attribute('sql_error', str(e))
+            return None
 
-# Main function chaining SQL query generation, execution, and answer generation
-def sql_chain(question):
+# Define coroutine generating the SQL query for a question and running it against the database
+# Returns the compact result table, a truncation notice for the user (or None) and an error message (or None)
+# sql_generation is an already started generate_sql_query() call, if any (speculative execution)
+async def fetch_data(question, sql_generation=None):
     # Generate SQL query string from the question using LLM
-    sql_query = generate_sql_query(question)
+    with span('sql.generate'):
+        sql_query = await (sql_generation if sql_generation is not None else generate_sql_query(question))
 
     # Use regex to extract SQL query text wrapped inside <SQL> tags
     pattern = "<SQL>(.*?)</SQL>"
@@ -85,36 +213,121 @@ def sql_chain(question):
 
     # Handle case where no valid SQL query is found in LLM response
     if len(matches) == 0:
-        return "Sorry, LLM is not able to generate a query for your question"
+        return None, None, "Sorry, LLM is not able to generate a query for your question"
 
-    # Print the extracted SQL query for debugging or logging
-    print("SQL QUERY:", matches[0].strip())
+    # Record the extracted SQL query on the request trace
+    sql_query = matches[0].strip()
+    set_attribute('sql', sql_query)
 
-    # Run the extracted SQL query against the database
-    response = run_query(matches[0].strip())
+    # Run the extracted SQL query against the database in a worker thread; the same query generated for
+    # the same question asked by other users at once runs only once
+    with span('sql.run_query') as query_span:
+        response = await sql_flight.do_async(sql_key(sql_query), lambda: asyncio.to_thread(run_query, sql_query))
+        if response is not None:
+            query_span.set_attribute('rows', len(response[1]))
 
     # Handle case where SQL query execution fails or returns nothing
     if response is None:
-        return "Sorry, there was a problem executing your query"
+        return None, None, "Sorry, there was a problem executing your query"
 
-    # Convert the query result DataFrame to a list of dictionaries (records)
-    context = response.to_dict(orient='records')
+    # Convert the query result rows to a compact table within the token budget
+    columns, rows, truncated = response
+    set_attribute('sql_rows', len(rows))
+    set_attribute('sql_truncated', truncated)
+    context, shown = serialize_rows(columns, rows)
+    if truncated or shown < len(rows):
+        return context, truncation_notice(shown), None
+    return context, None, None
 
-    # Pass the question and query result data to a comprehension function to generate a natural language answer
-    answer = data_comprehension(question, context)
+# Main function chaining SQL query generation, execution, and answer generation
+# sql_generation is an already started generate_sql_query() call to use instead of a new one, if any
+async def sql_chain(question, vector=None, sql_generation=None):
+    # Encode the question only if the caller did not provide its vector (off the event loop, it is CPU bound)
+    if vector is None:
+        vector = await asyncio.to_thread(embed_query, question)
+
+    # Serve a cached answer for an equivalent question, unless the database changed since
+    version = db_version()
+    tag = numeric_tag(question)
+    cached = sql_cache.get(vector, tag=tag, version=version)
+    set_attribute('cache_hit', cached is not None)
+    if cached is not None:
+        return cached
+
+    # Answer formulaic questions without any LLM call when the parser fully understands them
+    if SQL_FAST_PATH:
+        with span('sql.fast_path'):
+            answer = await run_fast_path(question)
+        set_attribute('sql_fast_path', answer is not None)
+        if answer is not None:
+            return answer
+
+    # Generate and run the SQL query for the question
+    context, notice, error = await fetch_data(question, sql_generation)
+    if error is not None:
+        return error
+
+    # Pass the question and query result data to a comprehension function to generate a natural language answer,
+    # telling the user when only part of the results was listed
+    with span('sql.comprehension'):
+        answer = await data_comprehension(question, context)
+    if notice:
+        answer += notice
+    sql_cache.put(vector, answer, tag=tag, version=version)
     return answer
 
+# Async generator variant of sql_chain that yields the answer token by token
+async def sql_chain_stream(question, vector=None, sql_generation=None):
+    # Encode the question only if the caller did not provide its vector
+    if vector is None:
+        vector = await asyncio.to_thread(embed_query, question)
+
+    # A cached answer is complete already, so it is yielded in one piece
+    version = db_version()
+    tag = numeric_tag(question)
+    cached = sql_cache.get(vector, tag=tag, version=version)
+    set_attribute('cache_hit', cached is not None)
+    if cached is not None:
+        yield cached
+        return
+
+    # Answer formulaic questions without any LLM call when the parser fully understands them
+    if SQL_FAST_PATH:
+        with span('sql.fast_path'):
+            answer = await run_fast_path(question)
+        set_attribute('sql_fast_path', answer is not None)
+        if answer is not None:
+            yield answer
+            return
+
+    # Generate and run the SQL query for the question; the query itself is needed in full, so it is not streamed
+    context, notice, error = await fetch_data(question, sql_generation)
+    if error is not None:
+        yield error
+        return
+
+    # Stream the answer while collecting it, then cache the full text
+    parts = []
+    with span('sql.comprehension'):
+        async for token in data_comprehension_stream(question, context):
+            parts.append(token)
+            yield token
+    if notice:
+        parts.append(notice)
+        yield notice
+    sql_cache.put(vector, ''.join(parts), tag=tag, version=version)
+
 # Define system prompt for LLM to generate human-friendly answers based on query results
 comprehension_prompt = """
 You are an expert in understanding the context of the question and replying based on the data pertaining to the question provided. 
-You will be provided with Question: and Data:. The data will be in the form of an array or a dataframe or dict. 
+You will be provided with Question: and Data:. The data will be a table with a header row and one row per line, columns separated by |. 
 Reply based on only the data provided as Data for answering the question asked as Question. 
 Do not write anything like 'Based on the data' or any other technical words. Just a plain simple natural language response.
 The Data would always be in context to the question asked. 
 For example is the question is “What is the average rating?” and data is “4.3”, then answer should be “The average rating for the product is 4.3”. 
 So make sure the response is curated with the question and data. 
 Make sure to note the column names to have some context, if needed, for your response.
-There can also be cases where you are given an entire dataframe in the Data: field. 
+There can also be cases where you are given an entire table in the Data: field. 
 Always remember that the data field contains the answer of the question asked. 
 All you need to do is to always reply in the following format when asked about a product: 
 Product title, price in indian rupees, discount, and rating, and then product link. 
@@ -125,27 +338,36 @@ For example:
 3. Campus Women Running Shoes: Rs. 1104 (35 percent off), Rating: 4.4 <link>
 """
 
-# Define function to generate natural language answer from data and question using LLM
-def data_comprehension(question, context):
+# Define function building the chat messages for answering a question from its query result data
+def comprehension_messages(question, context):
+    return [
+        {
+            "role": "system",
+            "content": comprehension_prompt,
+        },
+        {
+            "role": "user",
+            "content": f"QUESTION: {question} DATA: {context}",
+        }
+    ]
+
+# Define coroutine to generate natural language answer from data and question using LLM
+async def data_comprehension(question, context):
     # Call LLM with system prompt and user content combining question and query result data
-    chat_completion = client_sql.chat.completions.create(
-        messages=[
-            {
-                "role": "system",
-                "content": comprehension_prompt,
-            },
-            {
-                "role": "user",
-                "content": f"QUESTION: {question} DATA: {context}",
-            }
-        ],
-        model=os.environ['GROQ_MODEL'],
+    # and return the generated natural language answer
+    return await chat(
+        messages=comprehension_messages(question, context),
         temperature=0.2,  # Low temperature for consistent answers
         # max_tokens=1024  # Optional token limit
     )
 
-    # Return the generated natural language answer
-    return chat_completion.choices[0].message.content
+# Define async generator streaming the natural language answer from data and question
+async def data_comprehension_stream(question, context):
+    async for token in chat_stream(
+        messages=comprehension_messages(question, context),
+        temperature=0.2,  # Low temperature for consistent answers
+    ):
+        yield token
 
 # Main block for testing
 if __name__ == '__main__':
@@ -153,12 +375,12 @@ if __name__ == '__main__':
     question = "Give me PUMA shoes with rating higher than 4.5 and more than 30% discount"
 
     # Get the final natural language answer from the chain
-    answer = sql_chain(question)
+    answer = run(sql_chain(question))
 
     # Print the answer to console
     print(answer)
 
     # Uncomment below to test running a direct SQL query
     # query = "SELECT * from product where brand LIKE '%nike%'"
-    # df = run_query(query)
+    # columns, rows = run_query(query)
     # pass
@@ -0,0 +1,212 @@
+# Deterministic parser for formulaic product questions (brand, price, discount, rating, top-N, sort order).
+# Questions it fully understands are answered with a parameterized query and a templated answer,
+# skipping both LLM calls; anything else returns None and falls back to the LLM chain.
+import re
+from collections import namedtuple
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+# Structured form of a product question
+ProductQuery = namedtuple(
+    'ProductQuery',
+    ['brands', 'min_price', 'max_price', 'min_discount', 'min_rating', 'order_by', 'limit'],
+)
+
+# Words that carry no constraint; a question containing any other leftover word goes to the LLM.
+# Rating words are not filler: they only count as understood when a rating or sort pattern consumed them
+FILLER_WORDS = {
+    'a', 'all', 'am', 'an', 'and', 'any', 'are', 'available', 'be', 'best', 'buy', 'by', 'can', 'could',
+    'display', 'do', 'does', 'find', 'for', 'from', 'get', 'girls', 'give', 'good', 'have', 'has', 'i',
+    'in', 'is', 'it', 'items', 'ladies', 'let', 'like', 'list', 'looking', 'me', 'my', 'need', 'of',
+    'on', 'or', 'options', 'pair', 'pairs', 'please', 'price', 'priced', 'prices', 'product',
+    'products', 'see', 'shoe', 'shoes', 'show', 'sneaker', 'sneakers',
+    'some', 'sports', 'suggest', 'tell', 'that', 'the', 'them', 'there', 'these', 'those', 'to',
+    'want', 'what', 'which', 'whose', 'with', 'woman', 'women', 'womens', 'you', 'your',
+}
+
+# Comparison phrases mapped to lower (>=) or upper (<=) bounds
+UPPER = r'(?:under|below|less than|lower than|cheaper than|within|up ?to|not more than|at most|max(?:imum)?|<=?)'
+LOWER = r'(?:above|over|more than|greater than|higher than|at least|min(?:imum)?|>=?)'
+RUPEES = r'(?:rs\.?|inr|₹)'
+NUMBER = r'(\d+(?:\.\d+)?)'
+
+# Patterns are tried in order; the first match wins and its span is removed from the question
+RATING_PATTERNS = [
+    # "rating higher than 4.5", "rated above 4", "ratings of at least 4"
+    rf'\b(?:avg |average )?(?:ratings?|rated)\s*(?:of\s*)?{LOWER}\s*{NUMBER}\s*(?:stars?)?',
+    # "more than 4 star rating", "above 4 stars"
+    rf'\b{LOWER}\s*{NUMBER}\s*(?:-\s*)?stars?\s*(?:ratings?)?',
+    # "4+ rating", "4 stars and above"
+    rf'\b{NUMBER}\s*(?:\+|stars?\s*(?:and|&)\s*(?:above|up|more))\s*(?:stars?)?\s*(?:ratings?)?',
+]
+DISCOUNT_PATTERNS = [
+    # "more than 30% discount", "at least 40 percent off"
+    rf'\b(?:{LOWER}\s*)?{NUMBER}\s*(?:%|percent)\s*(?:or more\s*)?(?:discount|off)?',
+    # "discount of more than 30%", "discount above 30 percent"
+    rf'\bdiscount\s*(?:of\s*)?{LOWER}?\s*{NUMBER}\s*(?:%|percent)',
+]
+PRICE_PATTERNS = [
+    # "between Rs. 1000 and 3000", "in price range 1000 to 5000", "Rs 1000 - 2000"
+    (rf'\b(?:between|from|range(?: of)?)?\s*{RUPEES}?\s*{NUMBER}\s*(?:rs|rupees)?\s*(?:and|to|-)\s*{RUPEES}?\s*{NUMBER}\s*(?:rs|rupees)?', 'range'),
+    # "under Rs. 3000", "below 2000 rupees"
+    (rf'{UPPER}\s*{RUPEES}?\s*{NUMBER}\s*(?:rs|rupees)?', 'max'),
+    # "above Rs. 1000"
+    (rf'{LOWER}\s*{RUPEES}?\s*{NUMBER}\s*(?:rs|rupees)?', 'min'),
+]
+TOP_PATTERN = r'\b(?:top|best|first)\s*(\d+)\b'
+# A number followed by ratings/reviews/stars left over once the rating bound (if any) was consumed
+COUNT_PATTERN = rf'{NUMBER}\s*(?:k\b|\+)?\s*(?:user\s*|customer\s*)?(?:ratings?|reviews?|stars?|rated)\b'
+
+# Sort phrases mapped to ORDER BY clauses
+SORT_PATTERNS = [
+    (r'\b(?:highest|best|top)[ -]rated\b|\b(?:sorted|sort|ordered|order) by ratings?\b|\bby ratings?\b'
+     r'|\bbest ratings?\b|\bhighest ratings?\b|\bexcellent ratings?\b|\bhighly rated\b', 'avg_rating DESC'),
+    (r'\bcheapest\b|\blowest prices?\b|\b(?:sorted|sort|ordered|order) by price\b|\blow to high\b', 'price ASC'),
+    (r'\bmost expensive\b|\bhighest prices?\b|\bhigh to low\b', 'price DESC'),
+    (r'\b(?:highest|biggest|best|maximum|max) discounts?\b|\bmost discounted\b', 'discount DESC'),
+    (r'\bmost popular\b|\bmost reviewed\b|\bmost ratings\b|\bbest selling\b', 'total_ratings DESC'),
+]
+
+# Columns returned by the fast path, in the order the answer template uses them
+SELECT_COLUMNS = 'title, price, discount, avg_rating, product_link'
+
+
+# Define function removing the matched span from the text so leftover words can be checked
+def _consume(text, match):
+    return text[:match.start()] + ' ' + text[match.end():]
+
+
+# Define function parsing a question into a ProductQuery, or returning None if it is not fully understood
+# brands maps lower-cased brand names to the values stored in the product table
+def parse_question(question, brands):
+    text = ' ' + question.lower().replace(',', '') + ' '
+    min_price = max_price = min_discount = min_rating = order_by = limit = None
+    found = set()
+
+    # Rating bounds (numbers up to 5)
+    for pattern in RATING_PATTERNS:
+        match = re.search(pattern, text)
+        if match and float(match.group(1)) <= 5:
+            min_rating = float(match.group(1))
+            text = _consume(text, match)
+            break
+
+    # A number of ratings, reviews or stars that is not a rating bound ("more than 1000 ratings") must not be
+    # read as a price below
+    if re.search(COUNT_PATTERN, text):
+        return None
+
+    # Discount bounds ("on sale" / "with discount" mean any discount)
+    for pattern in DISCOUNT_PATTERNS:
+        match = re.search(pattern, text)
+        if match:
+            min_discount = float(match.group(1)) / 100
+            text = _consume(text, match)
+            break
+    else:
+        match = re.search(r'\b(?:on sale|on discount|with (?:a |some )?discounts?|discounted)\b', text)
+        if match:
+            min_discount = 0.01
+            text = _consume(text, match)
+
+    # Sort order
+    for pattern, clause in SORT_PATTERNS:
+        match = re.search(pattern, text)
+        if match:
+            order_by = clause
+            text = _consume(text, match)
+            break
+
+    # Top-N
+    match = re.search(TOP_PATTERN, text)
+    if match:
+        limit = int(match.group(1))
+        text = _consume(text, match)
+        order_by = order_by or 'avg_rating DESC'
+
+    # Price bounds (run after ratings/discounts so their numbers are already consumed)
+    for pattern, kind in PRICE_PATTERNS:
+        match = re.search(pattern, text)
+        if not match:
+            continue
+        if kind == 'range':
+            low, high = sorted(float(n) for n in match.groups())
+            min_price, max_price = low, high
+        elif kind == 'max':
+            max_price = float(match.group(1))
+        else:
+            min_price = float(match.group(1))
+        text = _consume(text, match)
+        if kind == 'range':
+            break
+
+    # Numbers this small are ratings or sizes rather than prices in rupees
+    if any(p is not None and p < 50 for p in (min_price, max_price)):
+        return None
+
+    # Brands, longest names first so "red tape" wins over a shorter overlapping name
+    for name in sorted(brands, key=len, reverse=True):
+        match = re.search(rf'(?<!\w){re.escape(name)}(?!\w)', text)
+        if match:
+            found.add(brands[name])
+            text = _consume(text, match)
+
+    # Everything left must be filler; an unknown word (colour, size, category...) needs the LLM
+    leftover = re.findall(r"[\w'₹]+", text)
+    if any(word not in FILLER_WORDS for word in leftover):
+        return None
+
+    # A question with no constraint at all is not a product search we can answer
+    if not found and all(v is None for v in (min_price, max_price, min_discount, min_rating, order_by, limit)):
+        return None
+
+    return ProductQuery(sorted(found), min_price, max_price, min_discount, min_rating, order_by, limit)
+
+
+# Define function building a parameterized SQL query for a ProductQuery
+def build_query(parsed):
+    conditions = []
+    params = []
+    if parsed.brands:
+        conditions.append(f"brand IN ({', '.join('?' for _ in parsed.brands)})")
+        params.extend(parsed.brands)
+    if parsed.min_price is not None:
+        conditions.append('price >= ?')
+        params.append(parsed.min_price)
+    if parsed.max_price is not None:
+        conditions.append('price <= ?')
+        params.append(parsed.max_price)
+    if parsed.min_discount is not None:
+        conditions.append('discount >= ?')
+        params.append(parsed.min_discount)
+    if parsed.min_rating is not None:
+        conditions.append('avg_rating >= ?')
+        params.append(parsed.min_rating)
+
+    query = f'SELECT {SELECT_COLUMNS} FROM product'
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    if parsed.order_by:
+        query += f' ORDER BY {parsed.order_by}'
+    if parsed.limit:
+        query += ' LIMIT ?'
+        params.append(parsed.limit)
+    return query, params
+
+
+# Define function shortening a product link to its path and product id (tracking parameters are dropped)
+def compact_link(url):
+    parts = urlsplit(url)
+    pid = parse_qs(parts.query).get('pid')
+    return f"{parts.scheme}://{parts.netloc}{parts.path}" + (f"?{urlencode({'pid': pid[0]})}" if pid else '')
+
+
+# Define function rendering result rows in the numbered-list format used by the LLM answers
+def render_answer(rows):
+    if not rows:
+        return "Sorry, I couldn't find any products matching your query."
+    lines = []
+    for i, (title, price, discount, avg_rating, product_link) in enumerate(rows, start=1):
+        discount_text = f" ({round(discount * 100)} percent off)" if discount else ''
+        rating_text = f"{avg_rating:g}" if avg_rating is not None else 'N/A'
+        lines.append(f"{i}. {title}: Rs. {price}{discount_text}, Rating: {rating_text} {compact_link(product_link)}")
+    return '\n'.join(lines)
@@ -0,0 +1,406 @@
+# Lightweight per-request tracing: named stage spans and attributes for one ask() call, handed to pluggable exporters.
+# Nothing is recorded unless a trace is active for the current request, so the hot path stays cheap when tracing is off.
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Define exporters enabled through the environment, e.g. TRACING_EXPORTERS=log,prometheus,otel (empty: tracing off)
+TRACING_EXPORTERS = [name.strip() for name in os.getenv('TRACING_EXPORTERS', '').split(',') if name.strip()]
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9464'))  # 0: no standalone endpoint (e.g. server.py serves /metrics itself)
+
+# Trace and innermost span of the request being handled;
+# both propagate into asyncio tasks and asyncio.to_thread workers
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+# Define a timed stage of a request; used as a context manager
+class Span:
+    __slots__ = ('trace', 'name', 'parent', 'attributes', 'start_ns', 'duration', '_start', '_token')
+
+    def __init__(self, trace, name, attributes):
+        self.trace = trace
+        self.name = name
+        self.parent = None
+        self.attributes = attributes
+        self.start_ns = 0
+        self.duration = 0.0
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        parent = _current_span.get()
+        self.parent = parent if parent is not None and parent.trace is self.trace else None
+        self._token = _current_span.set(self)
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._start
+        if exc_type is not None and issubclass(exc_type, Exception):
+            self.attributes['error'] = exc_type.__name__
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Exited from another context (e.g. a stream closed by a different task)
+            _current_span.set(self.parent)
+        self.trace.spans.append(self)
+        return False
+
+
+# Define the span handed out while no trace is active; it records nothing
+class _NoopSpan:
+    __slots__ = ()
+
+    def set_attribute(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+# Define a trace holding the spans and attributes of one request
+class Trace:
+    def __init__(self, name='request'):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.spans = []
+        self.attributes = {}
+        self.start_ns = time.time_ns()
+        self.duration = None
+        self._start = time.perf_counter()
+
+    # Record the total duration of the request
+    def finish(self):
+        self.duration = time.perf_counter() - self._start
+
+    # Return the total time spent per stage name
+    def stage_totals(self):
+        totals = {}
+        for span in self.spans:
+            totals[span.name] = totals.get(span.name, 0.0) + span.duration
+        return totals
+
+    # Return the trace as plain data (used by the log exporter)
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'duration_ms': round(self.duration * 1000, 3) if self.duration is not None else None,
+            'attributes': self.attributes,
+            'spans': [
+                {
+                    'name': span.name,
+                    'parent': span.parent.name if span.parent is not None else None,
+                    'offset_ms': round((span.start_ns - self.start_ns) / 1e6, 3),
+                    'duration_ms': round(span.duration * 1000, 3),
+                    'attributes': span.attributes,
+                }
+                for span in sorted(self.spans, key=lambda s: s.start_ns)
+            ],
+        }
+
+
+# Define function starting a trace for the current request (context) and returning it
+def start_trace(name='request'):
+    trace = Trace(name)
+    _current_trace.set(trace)
+    return trace
+
+
+# Define function returning a context manager that times a stage of the current request
+def span(name, **attributes):
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return Span(trace, name, attributes)
+
+
+# Define function attaching an attribute (route, row count, ...) to the current request
+def set_attribute(key, value):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attributes[key] = value
+
+
+# Define function adding to a numeric attribute of the current request and of the innermost span (e.g. token counts)
+def increment(key, amount=1):
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    trace.attributes[key] = trace.attributes.get(key, 0) + amount
+    current = _current_span.get()
+    if current is not None and current.trace is trace:
+        current.attributes[key] = current.attributes.get(key, 0) + amount
+
+
+# Define context manager tracing one request from start to end and exporting it when done
+class _Request:
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        self.trace = Trace(self.name)
+        self.trace.attributes.update(self.attributes)
+        self._token = _current_trace.set(self.trace)
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        self.trace.finish()
+        if exc_type is not None and issubclass(exc_type, Exception):
+            self.trace.attributes['error'] = exc_type.__name__
+        try:
+            _current_trace.reset(self._token)
+        except ValueError:
+            _current_trace.set(None)
+        export(self.trace)
+        return False
+
+
+# Define function returning a context manager for a whole request; a no-op when no exporter is configured
+def request(name='request', **attributes):
+    trace = _current_trace.get()
+    if trace is not None:
+        # Already traced by the caller (e.g. the benchmark), which owns the trace
+        trace.attributes.update(attributes)
+        return _NOOP_SPAN
+    if not get_exporters():
+        return _NOOP_SPAN
+    return _Request(name, attributes)
+
+
+# Define exporter printing each finished trace as one JSON line
+def log_exporter(trace):
+    print("TRACE", json.dumps(trace.to_dict(), default=str), flush=True)
+
+
+# Define in-process metrics (histograms and counters) rendered in the Prometheus text format
+class Metrics:
+    # Histogram buckets in seconds, from cache hits to slow LLM calls
+    BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    HELP = {
+        'chatbot_request_duration_seconds': ('histogram', 'End-to-end request latency by route'),
+        'chatbot_stage_duration_seconds': ('histogram', 'Latency of each pipeline stage'),
+        'chatbot_requests_total': ('counter', 'Requests by route and cache hit'),
+        'chatbot_llm_tokens_total': ('counter', 'LLM tokens by kind (prompt or completion)'),
+        'chatbot_sql_rows_total': ('counter', 'Rows returned by product SQL queries'),
+        'chatbot_coalesced_total': ('counter', 'LLM calls and SQL queries served by an identical call already in flight'),
+        'chatbot_speculative_work_total': ('counter', 'Speculatively started work by kind and outcome (used, discarded or cancelled)'),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    # Record one observation of a histogram; labels is a tuple of (name, value) pairs
+    def observe(self, metric, labels, value):
+        with self._lock:
+            histogram = self._histograms.get((metric, labels))
+            if histogram is None:
+                histogram = self._histograms[(metric, labels)] = [[0] * len(self.BUCKETS), 0.0, 0]
+            index = bisect.bisect_left(self.BUCKETS, value)
+            if index < len(self.BUCKETS):
+                histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    # Add to a counter
+    def inc(self, metric, labels, amount=1):
+        with self._lock:
+            self._counters[(metric, labels)] = self._counters.get((metric, labels), 0) + amount
+
+    # Render every metric in the Prometheus text exposition format
+    def render(self):
+        def label_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ''
+            return '{' + ','.join(f'{k}="{str(v)}"' for k, v in pairs) + '}'
+
+        lines = []
+        with self._lock:
+            histograms = {key: (list(h[0]), h[1], h[2]) for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+        for metric, (kind, help_text) in self.HELP.items():
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} {kind}')
+            if kind == 'histogram':
+                for (name, labels), (buckets, total, count) in sorted(histograms.items()):
+                    if name != metric:
+                        continue
+                    cumulative = 0
+                    for bound, n in zip(self.BUCKETS, buckets):
+                        cumulative += n
+                        lines.append(f'{metric}_bucket{label_text(labels, [("le", bound)])} {cumulative}')
+                    lines.append(f'{metric}_bucket{label_text(labels, [("le", "+Inf")])} {count}')
+                    lines.append(f'{metric}_sum{label_text(labels)} {total}')
+                    lines.append(f'{metric}_count{label_text(labels)} {count}')
+            else:
+                for (name, labels), value in sorted(counters.items()):
+                    if name == metric:
+                        lines.append(f'{metric}{label_text(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide metrics fed by the Prometheus exporter
+metrics = Metrics()
+
+
+# Define exporter aggregating each finished trace into the Prometheus metrics
+def prometheus_exporter(trace):
+    attributes = trace.attributes
+    route = str(attributes.get('route') or 'none')
+    cache_hit = 'true' if attributes.get('cache_hit') else 'false'
+    metrics.observe('chatbot_request_duration_seconds', (('route', route),), trace.duration)
+    metrics.inc('chatbot_requests_total', (('route', route), ('cache_hit', cache_hit)))
+    for span in trace.spans:
+        metrics.observe('chatbot_stage_duration_seconds', (('stage', span.name),), span.duration)
+    for kind in ('prompt', 'completion'):
+        tokens = attributes.get(f'llm_{kind}_tokens')
+        if tokens:
+            metrics.inc('chatbot_llm_tokens_total', (('kind', kind),), tokens)
+    if attributes.get('sql_rows'):
+        metrics.inc('chatbot_sql_rows_total', (), attributes['sql_rows'])
+    for kind in ('llm', 'sql'):
+        coalesced = attributes.get(f'{kind}_coalesced')
+        if coalesced:
+            metrics.inc('chatbot_coalesced_total', (('kind', kind),), coalesced)
+    for work, outcome in (attributes.get('speculation') or {}).items():
+        metrics.inc('chatbot_speculative_work_total', (('work', work), ('outcome', outcome)))
+
+
+# Define handler serving the metrics at /metrics
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = metrics.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('content-type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('content-length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Define function serving the metrics endpoint from a daemon thread; returns the server or None if the port is taken
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        print(f"Metrics endpoint not started on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    print(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+# Define exporter replaying each finished trace as OpenTelemetry spans (requires opentelemetry-api;
+# where the spans go is configured with the OpenTelemetry SDK, e.g. an OTLP exporter)
+class OtelExporter:
+    def __init__(self):
+        from opentelemetry import trace as otel_trace
+        self._otel = otel_trace
+        self.tracer = otel_trace.get_tracer('ecommerce-qa-chatbot')
+
+    # Keep only attribute values OpenTelemetry accepts
+    @staticmethod
+    def _attributes(attributes):
+        converted = {}
+        for key, value in attributes.items():
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple)):
+                value = [str(v) for v in value]
+            elif not isinstance(value, (str, bool, int, float)):
+                value = str(value)
+            converted[key] = value
+        return converted
+
+    def __call__(self, trace):
+        root = self.tracer.start_span(trace.name, start_time=trace.start_ns, attributes=self._attributes(trace.attributes))
+        created = {}
+        # Parents start before their children, so they exist by the time a child is created
+        for span in sorted(trace.spans, key=lambda s: s.start_ns):
+            parent = created.get(id(span.parent), root)
+            otel_span = self.tracer.start_span(
+                span.name,
+                context=self._otel.set_span_in_context(parent),
+                start_time=span.start_ns,
+                attributes=self._attributes(span.attributes),
+            )
+            otel_span.end(end_time=span.start_ns + int(span.duration * 1e9))
+            created[id(span)] = otel_span
+        root.end(end_time=trace.start_ns + int(trace.duration * 1e9))
+
+
+# Registered exporters; built from TRACING_EXPORTERS on first use
+_exporters = None
+_exporters_lock = threading.Lock()
+
+
+# Define function creating the exporters named in TRACING_EXPORTERS
+def _build_exporters():
+    exporters = []
+    for name in TRACING_EXPORTERS:
+        if name == 'log':
+            exporters.append(log_exporter)
+        elif name == 'prometheus':
+            if METRICS_PORT:
+                start_metrics_server()
+            exporters.append(prometheus_exporter)
+        elif name == 'otel':
+            try:
+                exporters.append(OtelExporter())
+            except ImportError:
+                print("TRACING_EXPORTERS includes 'otel' but opentelemetry-api is not installed; skipping it")
+        else:
+            print(f"Unknown tracing exporter '{name}', expected log, prometheus or otel")
+    return exporters
+
+
+# Define function returning the active exporters
+def get_exporters():
+    global _exporters
+    if _exporters is None:
+        with _exporters_lock:
+            if _exporters is None:
+                _exporters = _build_exporters()
+    return _exporters
+
+
+# Define function adding an exporter: any callable taking a finished Trace
+def register_exporter(exporter):
+    get_exporters()
+    with _exporters_lock:
+        _exporters.append(exporter)
+
+
+# Define function handing a finished trace to every exporter; a failing exporter never fails the request
+def export(trace):
+    for exporter in get_exporters():
+        try:
+            exporter(trace)
+        except Exception as e:
+            print(f"Tracing exporter {exporter!r} failed: {e}")
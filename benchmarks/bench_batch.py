@@ -0,0 +1,130 @@
+# Throughput benchmark of the batch API against a local stub LLM.
+# Answers the same queries one request at a time (ask_async with the same concurrency) and with
+# ask_batch_async at several batch sizes, and reports queries/sec plus the time spent in the
+# encode/route/retrieve stages per query as JSON.
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Define paths used by the benchmark
+repo_dir = Path(__file__).parent.parent
+corpus_path = Path(__file__).parent / 'pipeline_queries.jsonl'
+faqs_path = repo_dir / 'resources' / 'faq_data.csv'
+
+# Stages that the batch API runs once per batch instead of once per query
+batched_stages = {
+    'encode': 'batch.encode',
+    'route': 'batch.route',
+    'faq.retrieve': 'batch.faq_retrieve',
+}
+
+
+# Define coroutine answering the queries one request each, at most concurrency at a time
+async def run_single(pipeline, tracing, queries, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    stage_seconds = 0.0
+
+    async def one(query):
+        nonlocal stage_seconds
+        async with semaphore:
+            trace = tracing.start_trace()
+            await pipeline.ask_async(query)
+            totals = trace.stage_totals()
+            stage_seconds += sum(totals.get(name, 0.0) for name in batched_stages)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[asyncio.create_task(one(query)) for query in queries])
+    return time.perf_counter() - start, stage_seconds
+
+
+# Define coroutine answering the queries with the batch API, batch_size queries per call
+async def run_batched(batch, tracing, queries, concurrency, batch_size):
+    stage_seconds = 0.0
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch_size):
+        trace = tracing.start_trace()
+        await batch.ask_batch_async(queries[i:i + batch_size], concurrency)
+        totals = trace.stage_totals()
+        stage_seconds += sum(totals.get(name, 0.0) for name in batched_stages.values())
+    return time.perf_counter() - start, stage_seconds
+
+
+# Define function summarizing one run
+def summarize(mode, queries, elapsed, stage_seconds, batch_size=None):
+    return {
+        'mode': mode,
+        'batch_size': batch_size,
+        'queries': len(queries),
+        'throughput_qps': round(len(queries) / elapsed, 2),
+        'encode_route_retrieve_ms_per_query': round(stage_seconds / len(queries) * 1000, 3),
+    }
+
+
+# Define function configuring the environment, importing the app and running every mode
+def run_benchmark(args):
+    from stub_llm import serve
+
+    # Start the stub LLM unless an external endpoint was given
+    if args.base_url:
+        base_url = args.base_url
+    else:
+        server = serve(port=0, latency=args.llm_latency, jitter=args.llm_jitter)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    # Configure the app before importing it: stub LLM, scratch FAQ index, caches off
+    os.environ['GROQ_BASE_URL'] = base_url
+    os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+    os.environ.setdefault('GROQ_MODEL', 'stub-model')
+    os.environ.setdefault('FAQ_INDEX_PATH', tempfile.mkdtemp(prefix='faq-index-'))
+    os.environ['FAQ_CACHE_MAX_SIZE'] = '0'
+    os.environ['SQL_CACHE_MAX_SIZE'] = '0'
+    sys.path.insert(0, str(repo_dir / 'app'))
+
+    import batch
+    import faq
+    import pipeline
+    import tracing
+    faq.ingest_faq_data(faqs_path)
+
+    corpus = [json.loads(line)['query'] for line in corpus_path.read_text().splitlines() if line.strip()]
+    queries = [corpus[i % len(corpus)] for i in range(args.queries)]
+
+    async def main():
+        # Warm up so lazy loading is not counted
+        await batch.ask_batch_async(corpus, args.concurrency)
+        results = [summarize('single', queries, *await run_single(pipeline, tracing, queries, args.concurrency))]
+        for batch_size in args.batch_sizes:
+            elapsed, stage_seconds = await run_batched(batch, tracing, queries, args.concurrency, batch_size)
+            results.append(summarize('batch', queries, elapsed, stage_seconds, batch_size))
+        return results
+
+    return {
+        'config': {
+            'llm_base_url': base_url,
+            'llm_latency_s': args.llm_latency if not args.base_url else None,
+            'concurrency': args.concurrency,
+        },
+        'runs': asyncio.run(main()),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the batch API against one request per query.')
+    parser.add_argument('--queries', type=int, default=512, help='Queries answered per run')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 16, 64, 256], help='Batch sizes to compare')
+    parser.add_argument('--concurrency', type=int, default=16, help='Queries answered concurrently')
+    parser.add_argument('--llm-latency', type=float, default=0.3, help='Stub LLM latency in seconds')
+    parser.add_argument('--llm-jitter', type=float, default=0.05, help='Stub LLM latency jitter in seconds')
+    parser.add_argument('--base-url', default=None, help='Use this LLM endpoint instead of starting the stub')
+    parser.add_argument('--output', default=None, help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    report = json.dumps(run_benchmark(args), indent=2)
+    if args.output:
+        Path(args.output).write_text(report)
+    print(report)
@@ -0,0 +1,124 @@
+# Load test of single-flight coalescing against a local stub LLM.
+# Sends bursts of identical questions (covering every route) at rising duplicate concurrency, from coroutines on one
+# event loop (whole answers or streamed ones) and from a thread pool, with coalescing on and off, and reports the upstream LLM calls and SQL
+# query executions per burst as JSON. With coalescing they should stay flat as the duplicates rise.
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Define paths used by the benchmark
+repo_dir = Path(__file__).parent.parent
+faqs_path = repo_dir / 'resources' / 'faq_data.csv'
+
+# Define the repeated questions: a FAQ, a product search the SQL fast path answers, one that needs SQL generation
+# and small talk
+QUESTIONS = [
+    "How long does a refund take?",
+    "Show me top 3 nike shoes with rating higher than 4.5.",
+    "What are the highest rated Reebok running shoes for men?",
+    "Are you a robot?",
+]
+
+
+# Define function sending one burst of duplicates of every question and returning the elapsed seconds
+def run_burst(pipeline, mode, duplicates):
+    queries = [question for question in QUESTIONS for _ in range(duplicates)]
+    start = time.perf_counter()
+    if mode == 'async':
+        async def burst():
+            await asyncio.gather(*[pipeline.ask_async(query) for query in queries])
+        pipeline.run(burst())
+    elif mode == 'stream':
+        # The path the UI takes (POST /ask/stream): every answer is read token by token
+        async def read(query):
+            return [token async for token in pipeline.ask_stream_async(query)]
+
+        async def burst():
+            await asyncio.gather(*[read(query) for query in queries])
+        pipeline.run(burst())
+    else:
+        with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+            list(pool.map(pipeline.ask, queries))
+    return time.perf_counter() - start
+
+
+# Define function configuring the environment, importing the app and running every burst
+def run_benchmark(args):
+    from stub_llm import serve
+
+    server = serve(port=0, latency=args.llm_latency, jitter=args.llm_jitter, token_latency=args.token_latency)
+    requests = lambda: server.RequestHandlerClass.requests
+
+    # Configure the app before importing it: stub LLM, scratch FAQ index, caches off so only coalescing applies
+    os.environ['GROQ_BASE_URL'] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+    os.environ.setdefault('GROQ_MODEL', 'stub-model')
+    os.environ.setdefault('FAQ_INDEX_PATH', tempfile.mkdtemp(prefix='faq-index-'))
+    os.environ['FAQ_CACHE_MAX_SIZE'] = '0'
+    os.environ['SQL_CACHE_MAX_SIZE'] = '0'
+    os.environ['LLM_MAX_CONCURRENCY'] = str(max(args.duplicates) * len(QUESTIONS))
+    sys.path.insert(0, str(repo_dir / 'app'))
+
+    import faq
+    import llm
+    import pipeline
+    import sql
+    from db import get_pool
+    faq.ingest_faq_data(faqs_path)
+    pipeline.warm_up()
+
+    # Count the queries the database actually executes
+    pool = get_pool()
+    executed = [0]
+    query_bounded = pool.query_bounded
+
+    def counting_query_bounded(*args, **kwargs):
+        executed[0] += 1
+        return query_bounded(*args, **kwargs)
+
+    pool.query_bounded = counting_query_bounded
+
+    results = []
+    for coalesce in (False, True):
+        llm.llm_flight.enabled = coalesce
+        sql.sql_flight.enabled = coalesce
+        for mode in args.modes:
+            for duplicates in args.duplicates:
+                llm_before, sql_before = requests(), executed[0]
+                elapsed = run_burst(pipeline, mode, duplicates)
+                results.append({
+                    'coalesce': coalesce,
+                    'mode': mode,
+                    'duplicates': duplicates,
+                    'requests': duplicates * len(QUESTIONS),
+                    'llm_calls': requests() - llm_before,
+                    'sql_queries': executed[0] - sql_before,
+                    'elapsed_s': round(elapsed, 3),
+                })
+
+    return {
+        'config': {'llm_latency_s': args.llm_latency, 'token_latency_s': args.token_latency, 'questions': QUESTIONS},
+        'bursts': results,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test single-flight coalescing of identical requests.')
+    parser.add_argument('--duplicates', type=int, nargs='+', default=[1, 8, 32, 128], help='Identical requests per question and burst')
+    parser.add_argument('--modes', nargs='+', choices=['async', 'stream', 'threads'], default=['async', 'stream', 'threads'], help='How the burst is sent')
+    parser.add_argument('--llm-latency', type=float, default=0.3, help='Stub LLM latency in seconds')
+    parser.add_argument('--llm-jitter', type=float, default=0.05, help='Stub LLM latency jitter in seconds')
+    parser.add_argument('--token-latency', type=float, default=0.01, help='Stub LLM seconds between streamed tokens')
+    parser.add_argument('--output', default=None, help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    report = json.dumps(run_benchmark(args), indent=2)
+    if args.output:
+        Path(args.output).write_text(report)
+    print(report)
@@ -0,0 +1,110 @@
+# Benchmark of the embedding backends (PyTorch sentence-transformers vs ONNX int8 via onnxruntime).
+# Every backend runs in a fresh subprocess so import time and memory are measured from a clean start;
+# reports import and model load time, peak RSS, single-query encode latency and batch throughput as JSON.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Define paths used by the benchmark
+repo_dir = Path(__file__).parent.parent
+corpus_path = Path(__file__).parent / 'pipeline_queries.jsonl'
+
+
+# Define function measuring one backend inside the current (fresh) process
+def measure(backend, queries, batch_size, seconds):
+    import resource
+    sys.path.insert(0, str(repo_dir / 'app'))
+
+    def peak_rss_mb():
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    rss_start = peak_rss_mb()
+
+    # Import time of the runtime the backend needs
+    start = time.perf_counter()
+    if backend == 'onnx':
+        import onnxruntime  # noqa: F401
+        import tokenizers  # noqa: F401
+    else:
+        import sentence_transformers  # noqa: F401
+    import_s = time.perf_counter() - start
+
+    # Model load time
+    import embeddings
+    start = time.perf_counter()
+    embeddings.get_model()
+    load_s = time.perf_counter() - start
+    embeddings.encode(queries[:4])
+
+    # Single-query encodes, as done per chat request
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        embeddings.embed_query(queries[count % len(queries)])
+        count += 1
+    single_qps = count / (time.perf_counter() - start)
+
+    # Batch encodes, as done by the batch API and FAQ ingestion
+    batch = [queries[i % len(queries)] for i in range(batch_size)]
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        embeddings.encode(batch, batch_size)
+        count += len(batch)
+    batch_tps = count / (time.perf_counter() - start)
+
+    return {
+        'backend': backend,
+        'model': embeddings.embedding_version(),
+        'import_s': round(import_s, 3),
+        'load_s': round(load_s, 3),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'rss_start_mb': round(rss_start, 1),
+        'single_encodes_per_s': round(single_qps, 1),
+        'single_encode_ms': round(1000 / single_qps, 3),
+        'batch_size': batch_size,
+        'batch_texts_per_s': round(batch_tps, 1),
+    }
+
+
+# Define function running every backend in its own subprocess and collecting the results
+def run_benchmark(args):
+    results = []
+    for backend in args.backends:
+        env = dict(os.environ, EMBEDDING_BACKEND=backend)
+        if args.threads:
+            env['EMBEDDING_THREADS'] = str(args.threads)
+        command = [
+            sys.executable, __file__, '--worker', backend,
+            '--batch-size', str(args.batch_size), '--seconds', str(args.seconds),
+        ]
+        output = subprocess.run(command, env=env, capture_output=True, text=True)
+        if output.returncode != 0:
+            results.append({'backend': backend, 'error': output.stderr.strip().splitlines()[-1:]})
+            continue
+        results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    return {'config': {'batch_size': args.batch_size, 'seconds': args.seconds, 'threads': args.threads}, 'backends': results}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the embedding backends.')
+    parser.add_argument('--backends', nargs='+', default=['torch', 'onnx'], help='Backends to compare')
+    parser.add_argument('--batch-size', type=int, default=64, help='Texts per batch encode')
+    parser.add_argument('--seconds', type=float, default=5.0, help='Duration of each throughput measurement')
+    parser.add_argument('--threads', type=int, default=0, help='onnxruntime intra-op threads (0: default)')
+    parser.add_argument('--output', default=None, help='Write the JSON report to this file')
+    parser.add_argument('--worker', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        corpus = [json.loads(line)['query'] for line in corpus_path.read_text().splitlines() if line.strip()]
+        print(json.dumps(measure(args.worker, corpus, args.batch_size, args.seconds)))
+    else:
+        report = json.dumps(run_benchmark(args), indent=2)
+        if args.output:
+            Path(args.output).write_text(report)
+        print(report)
@@ -0,0 +1,84 @@
+# Benchmark of Streamlit reruns as a conversation grows.
+# Runs app/main.py headless (streamlit.testing) with a chat history of rising length and times a rerun at each
+# length, for the bounded history (only the recent window kept in memory and rendered) and for an unbounded one
+# (every message kept and rendered, as the UI used to do), and reports rerun time and session memory as JSON.
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Define paths used by the benchmark
+repo_dir = Path(__file__).parent.parent
+main_path = repo_dir / 'app' / 'main.py'
+
+# Define a typical turn: a product question and a markdown answer listing products
+QUESTION = "Show me top 3 nike shoes with rating higher than 4.5."
+ANSWER = "\n".join(
+    f"{i}. Nike Running Shoe {i}: Rs. {1999 + i * 500} (20 percent off), Rating: 4.{5 + i} "
+    f"<https://www.flipkart.com/nike-running-shoe-{i}>"
+    for i in range(1, 4)
+)
+
+
+# Define function timing reruns of the app at every conversation length, with the given in-memory caps
+def run_history(window, max_chars, turns, reruns, timeout):
+    from streamlit.testing.v1 import AppTest
+    from history import ChatHistory
+
+    history = ChatHistory(window=window, max_chars=max_chars)
+
+    app = AppTest.from_file(str(main_path), default_timeout=timeout)
+    app.session_state['history'] = history
+    app.session_state['earlier_pages'] = 0
+    app.run()
+
+    results = []
+    for length in turns:
+        while history.count < 2 * length:
+            history.append('user', QUESTION)
+            history.append('assistant', ANSWER)
+
+        timings = []
+        for _ in range(reruns):
+            start = time.perf_counter()
+            app.run()
+            timings.append(time.perf_counter() - start)
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+
+        results.append({
+            'turns': length,
+            'rendered_messages': len(app.chat_message),
+            'session_chars': history.chars,
+            'rerun_ms_p50': round(statistics.median(timings) * 1000, 1),
+            'rerun_ms_max': round(max(timings) * 1000, 1),
+        })
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time Streamlit reruns as the chat history grows.')
+    parser.add_argument('--turns', type=int, nargs='+', default=[10, 100, 250, 500, 1000], help='Conversation lengths in turns')
+    parser.add_argument('--window', type=int, default=20, help='Messages kept in memory by the bounded history')
+    parser.add_argument('--max-chars', type=int, default=50000, help='Characters kept in memory by the bounded history')
+    parser.add_argument('--reruns', type=int, default=5, help='Reruns timed per conversation length')
+    parser.add_argument('--timeout', type=float, default=120, help='Seconds a single rerun may take')
+    parser.add_argument('--output', default=None, help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    # Log the benchmark conversations to a scratch file
+    os.environ['HISTORY_DB_PATH'] = str(Path(tempfile.mkdtemp(prefix='chat-history-')) / 'history.sqlite')
+    sys.path.insert(0, str(repo_dir / 'app'))
+
+    report = json.dumps({
+        'config': {'window': args.window, 'max_chars': args.max_chars, 'reruns': args.reruns},
+        'bounded': run_history(args.window, args.max_chars, args.turns, args.reruns, args.timeout),
+        'unbounded': run_history(2 * max(args.turns), sys.maxsize, args.turns, args.reruns, args.timeout),
+    }, indent=2)
+    if args.output:
+        Path(args.output).write_text(report)
+    print(report)
@@ -0,0 +1,148 @@
+# End-to-end latency benchmark of the chat pipeline against a local stub LLM.
+# Replays a labeled query corpus through ask_async() at several concurrency levels and reports
+# per-stage p50/p95/p99, throughput, route accuracy and peak RSS as JSON (diffable between releases).
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Define paths used by the benchmark
+repo_dir = Path(__file__).parent.parent
+corpus_path = Path(__file__).parent / 'pipeline_queries.jsonl'
+faqs_path = repo_dir / 'resources' / 'faq_data.csv'
+
+
+# Define function returning the given percentile (0-100) of a list of seconds, in milliseconds
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return round(ordered[index] * 1000, 3)
+
+
+# Define function summarizing a list of durations
+def summarize(values):
+    return {
+        'count': len(values),
+        'p50_ms': percentile(values, 50),
+        'p95_ms': percentile(values, 95),
+        'p99_ms': percentile(values, 99),
+    }
+
+
+# Define coroutine running one traced request and returning (total seconds, trace)
+async def traced_ask(pipeline, tracing, query):
+    trace = tracing.start_trace()
+    start = time.perf_counter()
+    await pipeline.ask_async(query)
+    return time.perf_counter() - start, trace
+
+
+# Define coroutine replaying the corpus with the given number of concurrent clients
+async def run_level(pipeline, tracing, corpus, concurrency, total_requests):
+    queue = asyncio.Queue()
+    for i in range(total_requests):
+        queue.put_nowait(corpus[i % len(corpus)])
+    results = []
+
+    # Each client takes the next query as soon as its previous one is answered
+    async def client():
+        while not queue.empty():
+            case = queue.get_nowait()
+            # Each request runs in its own task so it gets its own trace context
+            latency, trace = await asyncio.create_task(traced_ask(pipeline, tracing, case['query']))
+            results.append((case, latency, trace))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    # Aggregate per-stage durations over all requests that went through the stage
+    stages = {}
+    for _, _, trace in results:
+        for name, duration in trace.stage_totals().items():
+            stages.setdefault(name, []).append(duration)
+
+    correct = sum(trace.attributes.get('route') == case['route'] for case, _, trace in results)
+    return {
+        'concurrency': concurrency,
+        'requests': len(results),
+        'throughput_rps': round(len(results) / elapsed, 2),
+        'total': summarize([latency for _, latency, _ in results]),
+        'stages': {name: summarize(values) for name, values in sorted(stages.items())},
+        'route_accuracy': round(correct / len(results), 3),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+# Define function configuring the environment, importing the app and running every concurrency level
+def run_benchmark(args):
+    from stub_llm import serve
+
+    # Start the stub LLM unless an external endpoint was given
+    if args.base_url:
+        base_url = args.base_url
+    else:
+        server = serve(port=0, latency=args.llm_latency, jitter=args.llm_jitter)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    # Configure the app before importing it: stub LLM, scratch FAQ index, caches off unless requested
+    os.environ['GROQ_BASE_URL'] = base_url
+    os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+    os.environ.setdefault('GROQ_MODEL', 'stub-model')
+    os.environ.setdefault('FAQ_INDEX_PATH', tempfile.mkdtemp(prefix='faq-index-'))
+    if not args.with_cache:
+        os.environ['FAQ_CACHE_MAX_SIZE'] = '0'
+        os.environ['SQL_CACHE_MAX_SIZE'] = '0'
+    sys.path.insert(0, str(repo_dir / 'app'))
+
+    start = time.perf_counter()
+    import faq
+    import pipeline
+    import tracing
+    faq.ingest_faq_data(faqs_path)
+    startup = time.perf_counter() - start
+
+    corpus = [json.loads(line) for line in corpus_path.read_text().splitlines() if line.strip()]
+
+    async def main():
+        # Warm up every route once so lazy loading is not counted in the first level
+        for case in corpus[:1] + [c for c in corpus if c['route'] != corpus[0]['route']][:2]:
+            await pipeline.ask_async(case['query'])
+        return [
+            await run_level(pipeline, tracing, corpus, concurrency, args.requests)
+            for concurrency in args.concurrency
+        ]
+
+    return {
+        'config': {
+            'llm_base_url': base_url,
+            'llm_latency_s': args.llm_latency if not args.base_url else None,
+            'requests_per_level': args.requests,
+            'cache': args.with_cache,
+            'corpus_size': len(corpus),
+        },
+        'startup_s': round(startup, 3),
+        'levels': asyncio.run(main()),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark ask() end to end against a stub LLM.')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32], help='Concurrent clients per level')
+    parser.add_argument('--requests', type=int, default=100, help='Requests per concurrency level')
+    parser.add_argument('--llm-latency', type=float, default=0.3, help='Stub LLM latency in seconds')
+    parser.add_argument('--llm-jitter', type=float, default=0.05, help='Stub LLM latency jitter in seconds')
+    parser.add_argument('--base-url', default=None, help='Use this LLM endpoint instead of starting the stub')
+    parser.add_argument('--with-cache', action='store_true', help='Keep the semantic answer caches enabled')
+    parser.add_argument('--output', default=None, help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    report = json.dumps(run_benchmark(args), indent=2)
+    if args.output:
+        Path(args.output).write_text(report)
+    print(report)
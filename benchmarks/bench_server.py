@@ -0,0 +1,161 @@
+# Load test of the HTTP API (app/server.py) against a local stub LLM.
+# Starts the server with each requested number of workers, waits until it is ready, then replays the query
+# corpus from concurrent clients on /ask (or /ask/stream) and reports throughput and latency as JSON.
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+import httpx
+from bench_pipeline import summarize
+from stub_llm import serve
+
+# Define paths used by the benchmark
+repo_dir = Path(__file__).parent.parent
+corpus_path = Path(__file__).parent / 'pipeline_queries.jsonl'
+
+
+# Define function starting the server in a subprocess and waiting until it answers /ready
+def start_server(port, workers, env, timeout):
+    process = subprocess.Popen(
+        [sys.executable, str(repo_dir / 'app' / 'server.py'), '--port', str(port), '--workers', str(workers)],
+        env=env,
+    )
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/ready", timeout=1).status_code == 200:
+                return process, time.perf_counter() - start
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Server not ready after {timeout}s")
+
+
+# Define coroutine sending one query and returning (total seconds, seconds to the first token)
+async def send(client, mode, query):
+    start = time.perf_counter()
+    if mode == 'ask':
+        response = await client.post('/ask', json={'query': query})
+        response.raise_for_status()
+        elapsed = time.perf_counter() - start
+        return elapsed, elapsed
+
+    first_token = None
+    async with client.stream('POST', '/ask/stream', json={'query': query}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if first_token is None and line.startswith('data:'):
+                first_token = time.perf_counter() - start
+    return time.perf_counter() - start, first_token
+
+
+# Define coroutine replaying the corpus from the given number of concurrent clients
+async def run_level(base_url, mode, corpus, concurrency, total_requests):
+    queue = asyncio.Queue()
+    for i in range(total_requests):
+        queue.put_nowait(corpus[i % len(corpus)])
+    latencies, first_tokens = [], []
+    errors = 0
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        # Each client sends the next query as soon as its previous one is answered
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                query = queue.get_nowait()
+                try:
+                    latency, first_token = await send(client, mode, query)
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(latency)
+                first_tokens.append(first_token)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+
+    result = {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 2),
+        'total': summarize(latencies),
+    }
+    if mode == 'stream':
+        result['first_token'] = summarize([t for t in first_tokens if t is not None])
+    return result
+
+
+# Define function running every level against a server with each number of workers
+def run_benchmark(args):
+    # Start the stub LLM unless an external endpoint was given
+    if args.base_url:
+        base_url = args.base_url
+    else:
+        stub = serve(port=0, latency=args.llm_latency, jitter=args.llm_jitter, token_latency=args.token_latency)
+        base_url = f"http://127.0.0.1:{stub.server_address[1]}"
+
+    # Configure the server: stub LLM, scratch FAQ index, caches off
+    env = dict(os.environ)
+    env['GROQ_BASE_URL'] = base_url
+    env.setdefault('GROQ_API_KEY', 'benchmark')
+    env.setdefault('GROQ_MODEL', 'stub-model')
+    env.setdefault('FAQ_INDEX_PATH', tempfile.mkdtemp(prefix='faq-index-'))
+    env['FAQ_CACHE_MAX_SIZE'] = '0'
+    env['SQL_CACHE_MAX_SIZE'] = '0'
+
+    corpus = [json.loads(line)['query'] for line in corpus_path.read_text().splitlines() if line.strip()]
+    runs = []
+    for workers in args.workers:
+        process, startup = start_server(args.port, workers, env, args.ready_timeout)
+        try:
+            server_url = f"http://127.0.0.1:{args.port}"
+            levels = [
+                asyncio.run(run_level(server_url, args.mode, corpus, concurrency, args.requests))
+                for concurrency in args.concurrency
+            ]
+        finally:
+            process.terminate()
+            process.wait()
+        runs.append({'workers': workers, 'ready_s': round(startup, 2), 'levels': levels})
+
+    return {
+        'config': {
+            'mode': args.mode,
+            'llm_base_url': base_url,
+            'llm_latency_s': args.llm_latency if not args.base_url else None,
+            'requests_per_level': args.requests,
+        },
+        'runs': runs,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test the HTTP API against a stub LLM.')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='Server worker processes per run')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[8, 32], help='Concurrent clients per level')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per concurrency level')
+    parser.add_argument('--mode', choices=['ask', 'stream'], default='ask', help='Endpoint to load')
+    parser.add_argument('--port', type=int, default=8765, help='Port the server listens on')
+    parser.add_argument('--ready-timeout', type=float, default=300, help='Seconds to wait for the server to warm up')
+    parser.add_argument('--llm-latency', type=float, default=0.3, help='Stub LLM latency in seconds')
+    parser.add_argument('--llm-jitter', type=float, default=0.05, help='Stub LLM latency jitter in seconds')
+    parser.add_argument('--token-latency', type=float, default=0.0, help='Stub LLM seconds between streamed tokens')
+    parser.add_argument('--base-url', default=None, help='Use this LLM endpoint instead of starting the stub')
+    parser.add_argument('--output', default=None, help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    report = json.dumps(run_benchmark(args), indent=2)
+    if args.output:
+        Path(args.output).write_text(report)
+    print(report)
@@ -0,0 +1,91 @@
+# Benchmark of the rule-based NL-to-SQL fast path against a labeled query set.
+# Reports coverage (share of questions answered without the LLM), parse accuracy and latency.
+# With --llm the same questions also go through the LLM chain (real Groq, or the stub via GROQ_BASE_URL).
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Make the app modules importable the same way Streamlit does (flat imports from app/)
+sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
+
+import sql
+from sql_parser import parse_question
+
+# Define the default labeled query set
+QUERIES_PATH = Path(__file__).parent / 'sql_fastpath_queries.jsonl'
+
+
+# Define function comparing a parsed query with its label (fields missing from the label must be empty)
+def matches_label(parsed, expected):
+    if parsed is None or expected is None:
+        return parsed is None and expected is None
+    actual = {k: v for k, v in parsed._asdict().items() if v not in (None, [])}
+    return actual == {k: v for k, v in expected.items()}
+
+
+# Define function returning latency percentiles in milliseconds
+def summarize(latencies):
+    if not latencies:
+        return None
+    ordered = sorted(latencies)
+    return {
+        'p50_ms': round(statistics.median(ordered) * 1000, 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+# Define function running the benchmark and returning the report
+def run_benchmark(path, with_llm=False, repeat=20):
+    cases = [json.loads(line) for line in Path(path).read_text().splitlines() if line.strip()]
+    brands = sql.get_brands()
+
+    handled = correct = false_accepts = 0
+    fast_latencies = []
+    for case in cases:
+        parsed = parse_question(case['question'], brands)
+        handled += parsed is not None
+        correct += matches_label(parsed, case['expected'])
+        false_accepts += parsed is not None and case['expected'] is None
+
+        # Time the full fast path (parse, query, render) for questions it handles
+        if parsed is not None:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                sql.fast_path_answer(case['question'])
+                fast_latencies.append(time.perf_counter() - start)
+
+    report = {
+        'queries': len(cases),
+        'coverage': round(handled / len(cases), 3),
+        'label_accuracy': round(correct / len(cases), 3),
+        'false_accepts': false_accepts,
+        'fast_path': summarize(fast_latencies),
+    }
+
+    # Time the two-call LLM chain for the same handled questions
+    if with_llm:
+        llm_latencies = []
+        for case in cases:
+            if case['expected'] is None:
+                continue
+            start = time.perf_counter()
+            context, _, error = sql.run(sql.fetch_data(case['question']))
+            if error is None:
+                sql.run(sql.data_comprehension(case['question'], context))
+            llm_latencies.append(time.perf_counter() - start)
+        report['llm_path'] = summarize(llm_latencies)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the rule-based SQL fast path.')
+    parser.add_argument('--queries', default=str(QUERIES_PATH), help='Labeled JSONL query set')
+    parser.add_argument('--llm', action='store_true', help='Also time the LLM path for comparison')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed repetitions per fast-path query')
+    args = parser.parse_args()
+
+    print(json.dumps(run_benchmark(args.queries, args.llm, args.repeat), indent=2))
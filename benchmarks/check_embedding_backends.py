@@ -0,0 +1,115 @@
+# Accuracy check of the ONNX (int8) embedding backend against the PyTorch backend.
+# Encodes the labeled benchmark queries, route utterances and FAQ questions with both backends and reports
+# embedding similarity, route agreement (and accuracy against the labels) and FAQ retrieval agreement as JSON.
+# Exits with status 1 when route or top-1 FAQ agreement is below --min-agreement.
+import argparse
+import csv
+import json
+import sys
+from pathlib import Path
+
+# Define paths used by the check
+repo_dir = Path(__file__).parent.parent
+pipeline_queries_path = Path(__file__).parent / 'pipeline_queries.jsonl'
+sql_queries_path = Path(__file__).parent / 'sql_fastpath_queries.jsonl'
+faqs_path = repo_dir / 'resources' / 'faq_data.csv'
+
+
+# Define function loading the labeled queries as (query, route) pairs
+def load_queries():
+    queries = []
+    for line in pipeline_queries_path.read_text().splitlines():
+        if line.strip():
+            case = json.loads(line)
+            queries.append((case['query'], case['route']))
+    for line in sql_queries_path.read_text().splitlines():
+        if line.strip():
+            queries.append((json.loads(line)['question'], 'sql'))
+    return queries
+
+
+# Define function encoding every text set with one backend
+def encode_all(model, texts):
+    return {name: model.encode(values, normalize_embeddings=True, convert_to_numpy=True) for name, values in texts.items()}
+
+
+# Define function comparing the two backends
+def check(args):
+    import numpy as np
+    sys.path.insert(0, str(repo_dir / 'app'))
+    from sentence_transformers import SentenceTransformer
+    from embeddings import OnnxModel
+    from router import ROUTER_SCORE_THRESHOLD, route_threshold, routes, score_routes
+
+    queries = load_queries()
+    with open(faqs_path, newline='', encoding='utf-8') as f:
+        faq_questions = [row['question'] for row in csv.DictReader(f)]
+    texts = {
+        'queries': [query for query, _ in queries],
+        'utterances': [u for route in routes for u in route.utterances],
+        'faq_questions': faq_questions,
+    }
+
+    reference = encode_all(SentenceTransformer(args.model, device='cpu'), texts)
+    candidate = encode_all(OnnxModel(args.onnx_path), texts)
+
+    # Embedding similarity of the same text under both backends
+    cosines = np.concatenate([(reference[name] * candidate[name]).sum(axis=1) for name in texts])
+
+    # Route every query with each backend's own utterance matrix, as the router would
+    utterance_routes = np.array([route.name for route in routes for _ in route.utterances])
+    route_names = [route.name for route in routes]
+    thresholds = np.array([route_threshold(route.score_threshold, ROUTER_SCORE_THRESHOLD) for route in routes], dtype=np.float32)
+    routed = {
+        backend: [name for name, _ in score_routes(
+            vectors['queries'], vectors['utterances'], utterance_routes, route_names, thresholds
+        )]
+        for backend, vectors in (('torch', reference), ('onnx', candidate))
+    }
+    labels = [route for _, route in queries]
+    route_agreement = np.mean([a == b for a, b in zip(routed['torch'], routed['onnx'])])
+
+    # Retrieve the two closest FAQ entries (cosine ranking, as in the Chroma index) for every FAQ query
+    faq_positions = [i for i, label in enumerate(labels) if label == 'faq']
+    top = {
+        backend: np.argsort(-(vectors['queries'][faq_positions] @ vectors['faq_questions'].T), axis=1)[:, :2]
+        for backend, vectors in (('torch', reference), ('onnx', candidate))
+    }
+    top1_agreement = np.mean(top['torch'][:, 0] == top['onnx'][:, 0])
+    top2_overlap = np.mean([len(set(a) & set(b)) / 2 for a, b in zip(top['torch'], top['onnx'])])
+
+    return {
+        'model': args.model,
+        'onnx_path': str(args.onnx_path),
+        'texts': sum(len(values) for values in texts.values()),
+        'embedding_cosine': {'min': round(float(cosines.min()), 5), 'mean': round(float(cosines.mean()), 5)},
+        'route_agreement': round(float(route_agreement), 4),
+        'route_accuracy': {
+            backend: round(float(np.mean([a == b for a, b in zip(names, labels)])), 4)
+            for backend, names in routed.items()
+        },
+        'route_disagreements': [
+            {'query': query, 'torch': a, 'onnx': b}
+            for (query, _), a, b in zip(queries, routed['torch'], routed['onnx']) if a != b
+        ],
+        'faq_queries': len(faq_positions),
+        'faq_top1_agreement': round(float(top1_agreement), 4),
+        'faq_top2_overlap': round(float(top2_overlap), 4),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the ONNX embedding backend with the PyTorch backend.')
+    parser.add_argument('--model', default='sentence-transformers/all-MiniLM-L6-v2', help='Reference sentence-transformers model')
+    parser.add_argument('--onnx-path', default=str(repo_dir / 'app' / 'onnx_model'), help='Exported ONNX model directory')
+    parser.add_argument('--min-agreement', type=float, default=0.98, help='Fail below this route / top-1 FAQ agreement')
+    parser.add_argument('--output', default=None, help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    result = check(args)
+    report = json.dumps(result, indent=2)
+    if args.output:
+        Path(args.output).write_text(report)
+    print(report)
+    passed = result['route_agreement'] >= args.min_agreement and result['faq_top1_agreement'] >= args.min_agreement
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,98 @@
+# Startup report: where the cold start of each entry point goes.
+# Imports each module in a fresh interpreter under `python -X importtime` and reports the total import time,
+# the slowest top-level packages (cumulative) and the peak RSS after import; then, in another fresh
+# interpreter, times FAQ ingestion and the warm-up a first request would otherwise pay for.
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Define paths used by the report
+repo_dir = Path(__file__).parent.parent
+app_dir = repo_dir / 'app'
+faqs_path = repo_dir / 'resources' / 'faq_data.csv'
+
+# Define the child process measuring ingestion and warm-up after the import
+WARM_UP_CODE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import pipeline
+from faq import ingest_faq_data
+imported = time.perf_counter()
+ingest_faq_data(sys.argv[1])
+ingested = time.perf_counter()
+pipeline.warm_up()
+warmed = time.perf_counter()
+print(json.dumps({
+    'import_s': round(imported - start, 3),
+    'ingest_s': round(ingested - imported, 3),
+    'warm_up_s': round(warmed - ingested, 3),
+    'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+}))
+"""
+
+
+# Define function parsing `-X importtime` output into {module: (self microseconds, cumulative microseconds)}
+def parse_importtime(stderr):
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+# Define function importing a module in a fresh interpreter and summarizing where the time went
+def import_report(module, top, env):
+    code = f"import resource, {module}; print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)"
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=app_dir, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        return {'module': module, 'error': result.stderr.strip().splitlines()[-1]}
+    modules = parse_importtime(result.stderr)
+
+    # Cumulative time of every top-level package (its submodules are included in it)
+    packages = {name: cumulative_us for name, (_, cumulative_us) in modules.items() if '.' not in name and name != module}
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+
+    return {
+        'module': module,
+        'import_ms': round(modules[module][1] / 1000, 1),
+        'peak_rss_mb': round(float(result.stdout.strip().splitlines()[-1]), 1),
+        'slowest_packages_ms': {name: round(us / 1000, 1) for name, us in slowest},
+    }
+
+
+# Define function timing import, FAQ ingestion and warm-up of the pipeline in a fresh interpreter
+def warm_up_report(env):
+    result = subprocess.run(
+        [sys.executable, '-c', WARM_UP_CODE, str(faqs_path)],
+        cwd=app_dir, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        return {'error': result.stderr.strip().splitlines()[-1]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Report import time and warm-up cost of the app entry points.')
+    parser.add_argument('--modules', nargs='+', default=['client', 'pipeline', 'server'], help='Modules to import')
+    parser.add_argument('--top', type=int, default=8, help='Slowest packages listed per module')
+    parser.add_argument('--no-warm-up', action='store_true', help='Only report import times')
+    parser.add_argument('--output', default=None, help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    report = {'imports': [import_report(module, args.top, env) for module in args.modules]}
+    if not args.no_warm_up:
+        report['warm_up'] = warm_up_report(env)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    print(text)
@@ -0,0 +1,171 @@
+# Local stub of the Groq chat completions API with injectable latency and errors.
+# Point the app at it with GROQ_BASE_URL=http://127.0.0.1:8001 (any GROQ_API_KEY value works).
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Canned SQL returned whenever the request carries the SQL generation prompt
+STUB_SQL = "<SQL>SELECT * FROM product WHERE brand LIKE '%nike%' ORDER BY avg_rating DESC LIMIT 5</SQL>"
+
+
+# Define function producing a deterministic completion for the given chat messages
+def fake_completion(messages):
+    system = next((m['content'] for m in messages if m['role'] == 'system'), '')
+    if '<SQL></SQL>' in system:
+        return STUB_SQL
+    return f"Stub answer to: {messages[-1]['content'].strip()[:200]}"
+
+
+# Define request handler emulating POST /openai/v1/chat/completions
+class StubLLMHandler(BaseHTTPRequestHandler):
+    # Keep connections alive so pooled clients can reuse them
+    protocol_version = 'HTTP/1.1'
+
+    # Injected behaviour, configured by serve()
+    latency = 0.5
+    jitter = 0.0
+    error_rate = 0.0
+    token_latency = 0.0
+
+    # Number of completion requests received (read through server.RequestHandlerClass.requests)
+    requests = 0
+    _requests_lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('content-length', 0))) or b'{}')
+        if not self.path.endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+            return
+        with self._requests_lock:
+            type(self).requests += 1
+
+        # Simulate model latency
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+        # Simulate rate limiting and server errors
+        if random.random() < self.error_rate:
+            status = random.choice([429, 503])
+            self._send_json(status, {'error': {'message': 'Injected error'}}, {'retry-after': '0'})
+            return
+
+        content = fake_completion(body.get('messages', []))
+        prompt_tokens = sum(len(m['content'].split()) for m in body.get('messages', []))
+        if body.get('stream'):
+            try:
+                self._stream(body.get('model', 'stub'), content, prompt_tokens)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client stopped reading the stream early
+                self.close_connection = True
+            return
+        self._send_json(200, {
+            'id': f'chatcmpl-{uuid.uuid4().hex}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': len(content.split()),
+                'total_tokens': prompt_tokens + len(content.split()),
+            },
+        })
+
+    # Send the completion as server-sent events, one word per chunk, using chunked transfer encoding
+    def _stream(self, model, content, prompt_tokens):
+        self.send_response(200)
+        self.send_header('content-type', 'text/event-stream')
+        self.send_header('transfer-encoding', 'chunked')
+        self.end_headers()
+
+        completion_id = f'chatcmpl-{uuid.uuid4().hex}'
+        words = content.split(' ')
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.token_latency)
+            self._send_event({
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{
+                    'index': 0,
+                    'delta': {'content': word if i == len(words) - 1 else word + ' '},
+                    'finish_reason': None,
+                }],
+            })
+        self._send_event({
+            'id': completion_id,
+            'object': 'chat.completion.chunk',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}],
+            # Groq reports the token usage of a stream on its last chunk
+            'x_groq': {'id': completion_id, 'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': len(words),
+                'total_tokens': prompt_tokens + len(words),
+            }},
+        })
+        self._send_chunk(b'data: [DONE]\n\n')
+        self._send_chunk(b'')
+
+    def _send_event(self, payload):
+        self._send_chunk(f'data: {json.dumps(payload)}\n\n'.encode('utf-8'))
+
+    def _send_chunk(self, data):
+        self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('content-type', 'application/json')
+        self.send_header('content-length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    # Silence the default per-request logging
+    def log_message(self, format, *args):
+        pass
+
+
+# Define function starting the stub server in a background thread and returning it
+def serve(host='127.0.0.1', port=8001, latency=0.5, jitter=0.0, error_rate=0.0, token_latency=0.0):
+    handler = type('ConfiguredStubLLMHandler', (StubLLMHandler,), {
+        'latency': latency,
+        'jitter': jitter,
+        'error_rate': error_rate,
+        'token_latency': token_latency,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='stub-llm', daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a local stub of the Groq chat completions API.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', type=float, default=0.5, help='Seconds of latency per request')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Uniform +/- jitter in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests failing with 429/503')
+    parser.add_argument('--token-latency', type=float, default=0.0, help='Seconds between streamed tokens')
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.latency, args.jitter, args.error_rate, args.token_latency)
+    print(f"Stub LLM listening on http://{args.host}:{args.port} (latency {args.latency}s)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
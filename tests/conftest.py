@@ -0,0 +1,7 @@
+# Make the app modules and the scraping scripts importable the way they import each other (flat, by file name)
+import sys
+from pathlib import Path
+
+repo_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(repo_dir / 'app'))
+sys.path.insert(0, str(repo_dir / 'web-scraping'))
@@ -0,0 +1,51 @@
+import numpy as np
+from cache import SemanticCache
+
+
+# Define function returning a normalised vector
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_matches_the_entry_with_the_same_tag_even_if_another_is_closer():
+    cache = SemanticCache(threshold=0.9)
+    cache.put(unit(1, 0.1), 'under 1000', tag=('1000',))
+    cache.put(unit(1, 0), 'under 2000', tag=('2000',))
+    assert cache.get(unit(1, 0), tag=('1000',)) == 'under 1000'
+    assert cache.get(unit(1, 0), tag=('2000',)) == 'under 2000'
+    assert cache.get(unit(1, 0), tag=('3000',)) is None
+
+
+def test_put_replaces_an_entry_of_the_same_tag_above_the_threshold():
+    cache = SemanticCache(threshold=0.9)
+    cache.put(unit(1, 0), 'first', tag=('1000',))
+    cache.put(unit(1, 0.05), 'second', tag=('1000',))
+    cache.put(unit(1, 0.05), 'other tag', tag=('2000',))
+    assert cache.stats()['size'] == 2
+    assert cache.get(unit(1, 0), tag=('1000',)) == 'second'
+
+
+def test_expired_entries_are_skipped_for_a_live_one(monkeypatch):
+    cache = SemanticCache(threshold=0.9, ttl=10)
+    now = [100.0]
+    monkeypatch.setattr('cache.time.monotonic', lambda: now[0])
+    # Both entries are above the threshold for the query but not for each other, the older one is closer
+    cache.put(unit(1, 0.4), 'old')
+    now[0] = 105.0
+    cache.put(unit(1, -0.45), 'newer')
+    assert cache.stats()['size'] == 2
+    now[0] = 112.0
+    assert cache.get(unit(1, 0)) == 'newer'
+    assert cache.stats()['size'] == 1
+
+
+def test_least_recently_used_entry_is_evicted_when_full():
+    cache = SemanticCache(threshold=0.9, max_size=2)
+    cache.put(unit(1, 0, 0), 'a')
+    cache.put(unit(0, 1, 0), 'b')
+    assert cache.get(unit(1, 0, 0)) == 'a'
+    cache.put(unit(0, 0, 1), 'c')
+    assert cache.get(unit(0, 1, 0)) is None
+    assert cache.get(unit(1, 0, 0)) == 'a'
+    assert cache.get(unit(0, 0, 1)) == 'c'
@@ -0,0 +1,98 @@
+import contextlib
+import sqlite3
+import pytest
+import db
+from db import ConnectionPool, migrate
+
+PRODUCTS = [
+    ('https://www.flipkart.com/p1', 'Nike Revolution 6 Running Shoes For Men', 'NIKE', 3295, 0.2, 4.3, 120),
+    ('https://www.flipkart.com/p2', 'Campus 100% Mesh Running Shoes For Men', 'CAMPUS', 999, 0.45, 4.0, 800),
+    ('https://www.flipkart.com/p3', 'Reebok Lite Plus 3 Walking Shoes For Women', 'REEBOK', 2599, 0.3, 4.4, 60),
+    ('https://www.flipkart.com/p4', 'Puma Smash v2 Sneakers For Men', 'PUMA', 2199, 0.5, 4.2, 300),
+]
+
+
+# Define fixture creating a migrated product database with a few rows
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / 'db.sqlite'
+    with contextlib.closing(sqlite3.connect(path)) as conn:
+        conn.execute(
+            "CREATE TABLE product (product_link TEXT PRIMARY KEY, title TEXT, brand TEXT, price INTEGER, "
+            "discount FLOAT, avg_rating FLOAT, total_ratings INTEGER)"
+        )
+        conn.executemany("INSERT INTO product VALUES (?, ?, ?, ?, ?, ?, ?)", PRODUCTS)
+        conn.commit()
+    migrate(path)
+    return path
+
+
+@pytest.mark.parametrize('sql', [
+    "SELECT product_link FROM product WHERE brand LIKE '%nike%' ORDER BY product_link",
+    "SELECT product_link FROM product WHERE LOWER(title) LIKE '%running shoes%' AND price < 4000 ORDER BY product_link",
+    "SELECT product_link FROM product WHERE title LIKE '%100\\%%' ESCAPE '\\' ORDER BY product_link",
+    "SELECT product_link FROM product WHERE brand LIKE '%PUMA%' COLLATE NOCASE ORDER BY product_link",
+    "SELECT product_link FROM product WHERE title LIKE '%shoes%' AND brand LIKE '%ree%' ORDER BY product_link",
+])
+def test_rewritten_query_returns_same_rows(db_path, sql):
+    pool = ConnectionPool(db_path)
+    assert pool.has_fts
+    rewritten = pool.query(sql)
+    pool.has_fts = False
+    assert rewritten == pool.query(sql)
+
+
+def test_like_with_escape_is_not_rewritten(db_path):
+    pool = ConnectionPool(db_path)
+    sql = "SELECT * FROM product WHERE title LIKE '%100\\%%' ESCAPE '\\'"
+    assert pool.rewrite(sql) == sql
+    assert 'product_fts' in pool.rewrite("SELECT * FROM product WHERE title LIKE '%100%'")
+
+
+def test_failed_connect_gives_the_slot_back(db_path, monkeypatch):
+    pool = ConnectionPool(db_path, size=1)
+    with pool.connection():
+        pass
+    # Drop the idle connection so the next caller has to open one
+    pool._idle.get_nowait()
+    pool._created = 0
+
+    def fail():
+        raise sqlite3.OperationalError('unable to open database file')
+
+    connect = pool._connect
+    monkeypatch.setattr(pool, '_connect', fail)
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.connection():
+            pass
+    assert pool._created == 0
+
+    monkeypatch.setattr(pool, '_connect', connect)
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM product").fetchone() == (len(PRODUCTS),)
+
+
+def test_busy_pool_times_out(db_path, monkeypatch):
+    monkeypatch.setattr(db, 'DB_POOL_TIMEOUT', 0.05)
+    pool = ConnectionPool(db_path, size=1)
+    with pool.connection():
+        with pytest.raises(TimeoutError):
+            with pool.connection():
+                pass
+
+
+@pytest.mark.parametrize('suffix', ['', ';', ';\n', ' -- top brands', '; -- top brands', ';\n/* done */\n', ';;'])
+def test_bounded_query_accepts_trailing_semicolons_and_comments(db_path, suffix):
+    pool = ConnectionPool(db_path)
+    columns, rows, truncated = pool.query_bounded(
+        f"SELECT brand FROM product WHERE brand LIKE '%a%' ORDER BY brand{suffix}", max_rows=1,
+    )
+    assert columns == ['brand']
+    assert rows == [('CAMPUS',)]
+    assert truncated
+
+
+def test_bounded_query_keeps_semicolons_inside_literals(db_path):
+    pool = ConnectionPool(db_path)
+    _, rows, _ = pool.query_bounded("SELECT 'a;' AS value -- trailing; comment")
+    assert rows == [('a;',)]
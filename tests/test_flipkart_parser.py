@@ -0,0 +1,51 @@
+from pathlib import Path
+import pytest
+from flipkart_parser import ParseError, parse_listing, parse_product
+
+fixtures_dir = Path(__file__).parent / 'fixtures'
+product_link = 'https://www.flipkart.com/asian-wonder-13-running-shoes-women/p/itm1a2b3c4d5e6f7?pid=SHOFZ7H5GZUYNHBX'
+
+
+# Define function reading a saved page
+def read_fixture(name):
+    return (fixtures_dir / name).read_text(encoding='utf-8')
+
+
+def test_parse_listing_returns_absolute_product_links():
+    assert parse_listing(read_fixture('flipkart_listing.html')) == [
+        'https://www.flipkart.com/asian-wonder-13-running-shoes-women/p/itm1a2b3c4d5e6f7'
+        '?pid=SHOFZ7H5GZUYNHBX&lid=LSTSHOFZ7H5GZUYNHBXABCDE&marketplace=FLIPKART',
+        'https://www.flipkart.com/campus-north-plus-running-shoes-women/p/itm9f8e7d6c5b4a3'
+        '?pid=SHOGHKZ3XMTQ9WNY&lid=LSTSHOGHKZ3XMTQ9WNYFGHIJ',
+    ]
+
+
+def test_parse_product_extracts_every_column():
+    assert parse_product(read_fixture('flipkart_product.html'), product_link) == {
+        'product_link': product_link,
+        'title': 'Wonder-13 Running Shoes For Women',
+        'brand': 'ASIAN',
+        'price': '1299',
+        'discount': 0.56,
+        'avg_rating': '4.1',
+        'total_ratings': 12345,
+    }
+
+
+def test_parse_product_without_discount_or_reviews():
+    html = read_fixture('flipkart_product.html')
+    html = html.replace('<div class="UkUFwK WW8yVX"><span>56% off</span></div>', '')
+    html = html.replace('<span class="Y1HWO0">', '<div class="E3XX7J">Be the first to Review this product</div><span>')
+    product = parse_product(html, product_link)
+    assert (product['discount'], product['avg_rating'], product['total_ratings']) == ('', '', '')
+
+
+@pytest.mark.parametrize('status', ['Currently Unavailable', 'Sold Out'])
+def test_parse_product_returns_none_when_unavailable(status):
+    html = read_fixture('flipkart_product.html').replace('<body>', f'<body><div class="Z8JjpR">{status}</div>')
+    assert parse_product(html, product_link) is None
+
+
+def test_parse_product_rejects_pages_that_are_not_product_pages():
+    with pytest.raises(ParseError):
+        parse_product(read_fixture('flipkart_listing.html'), product_link)
@@ -0,0 +1,63 @@
+import gc
+import pytest
+import history
+from history import ChatHistory
+
+
+# Define fixture pointing the history log to a scratch file
+@pytest.fixture
+def log(tmp_path, monkeypatch):
+    monkeypatch.setattr(history, 'HISTORY_DB_PATH', str(tmp_path / 'history.sqlite'))
+    monkeypatch.setattr(history, '_conn', None)
+    monkeypatch.setattr(history, '_last_prune', None)
+    yield lambda: history.get_log().execute("SELECT session, seq FROM message ORDER BY session, seq").fetchall()
+    history._conn.close()
+
+
+def test_tail_is_bounded_and_older_messages_are_paged_in(log):
+    chat = ChatHistory(window=4, max_chars=1000)
+    for i in range(10):
+        chat.append('user' if i % 2 == 0 else 'assistant', f"message {i} " + 'x' * (500 if i == 3 else 0))
+    assert chat.recent() == [('user', f"message {i} ") if i % 2 == 0 else ('assistant', f"message {i} ") for i in range(6, 10)]
+    assert chat.hidden() == 6
+    assert chat.earlier(3) == [('assistant', 'message 3 ' + 'x' * 500), ('user', 'message 4 '), ('assistant', 'message 5 ')]
+    assert len(log()) == 10
+
+
+def test_character_cap_holds_for_long_messages(log):
+    chat = ChatHistory(window=10, max_chars=100)
+    chat.append('user', 'short question')
+    chat.append('assistant', 'y' * 500)
+    assert chat.chars <= 100
+    assert chat.recent() == [('assistant', 'y' * 100)]
+    assert chat.earlier(10) == [('user', 'short question')]
+
+
+def test_ended_session_is_deleted(log):
+    kept, ended = ChatHistory(), ChatHistory()
+    kept.append('user', 'hello')
+    ended.append('user', 'bye')
+    del ended
+    gc.collect()
+    assert log() == [(kept.session_id, 0)]
+
+
+def test_expired_messages_are_pruned_at_most_every_interval(log, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(history.time, 'time', lambda: clock[0])
+    monkeypatch.setattr(history.time, 'monotonic', lambda: clock[0])
+    monkeypatch.setattr(history, 'HISTORY_RETENTION_HOURS', 1)
+    monkeypatch.setattr(history, 'HISTORY_PRUNE_INTERVAL', 60)
+    old, new = ChatHistory(), ChatHistory()
+    old.append('user', 'old')
+    clock[0] += 3590
+    new.append('user', 'new')
+
+    # The old message expired, but the last prune is less than an interval ago
+    clock[0] += 30
+    new.append('assistant', 'answer')
+    assert len(log()) == 3
+
+    clock[0] += 40
+    new.append('user', 'again')
+    assert log() == [(new.session_id, 0), (new.session_id, 1), (new.session_id, 2)]
@@ -0,0 +1,21 @@
+import numpy as np
+from router import route_threshold, score_routes
+
+
+def test_route_threshold_falls_back_to_the_router_then_to_none():
+    assert route_threshold(0.5, 0.3) == 0.5
+    assert route_threshold(None, 0.3) == 0.3
+    assert route_threshold(0.0, 0.3) == 0.0
+    assert route_threshold(None, 0.0) == 0.0
+    assert route_threshold(None, None) == -np.inf
+
+
+def test_zero_threshold_rejects_negative_scores():
+    utterances = np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+    utterance_routes = np.array(['faq', 'sql'])
+    thresholds = np.array([route_threshold(None, 0.0)] * 2, dtype=np.float32)
+    (positive, _), (negative, _) = score_routes(
+        [[1.0, -0.2], [-1.0, -0.1]], utterances, utterance_routes, ['faq', 'sql'], thresholds, top_k=1,
+    )
+    assert positive == 'faq'
+    assert negative is None
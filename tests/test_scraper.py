@@ -0,0 +1,51 @@
+import json
+from pathlib import Path
+from scraper import read_checkpoint, scrape_products
+
+fixtures_dir = Path(__file__).parent / 'fixtures'
+
+
+# Define a fetch pool serving the saved product page for every URL, without threads or network
+class FixturePool:
+    def __init__(self):
+        self.fetched = []
+
+    def fetch(self, url):
+        self.fetched.append(url)
+        return (fixtures_dir / 'flipkart_product.html').read_text(encoding='utf-8')
+
+    def map(self, fn, urls):
+        for url in urls:
+            try:
+                yield url, fn(url)
+            except Exception as e:
+                yield url, e
+
+
+def test_scrape_products_resumes_from_the_checkpoint(tmp_path):
+    links = [f"https://www.flipkart.com/p/{i}" for i in range(4)]
+    checkpoint = tmp_path / 'checkpoint.jsonl'
+    checkpoint.write_text(
+        json.dumps({'url': links[0], 'status': 'ok', 'product': {'title': 'Scraped before'}}) + '\n'
+        + json.dumps({'url': links[1], 'status': 'unavailable', 'product': None}) + '\n'
+        + json.dumps({'url': links[2], 'status': 'failed', 'error': 'HTTP 503'}) + '\n',
+        encoding='utf-8',
+    )
+
+    pool = FixturePool()
+    entries = scrape_products(pool, links, checkpoint)
+
+    # Finished URLs are skipped, the failed one is tried again
+    assert pool.fetched == links[2:]
+    assert [entry['status'] for entry in entries] == ['ok', 'unavailable', 'ok', 'ok']
+    assert entries[0]['product'] == {'title': 'Scraped before'}
+    assert entries[2]['product']['brand'] == 'ASIAN'
+
+    # The new results are appended, and the latest entry of a URL wins when the checkpoint is read back
+    assert read_checkpoint(checkpoint)[links[2]]['status'] == 'ok'
+    assert len(checkpoint.read_text(encoding='utf-8').splitlines()) == 5
+
+    # A second run has nothing left to fetch
+    pool = FixturePool()
+    scrape_products(pool, links, checkpoint)
+    assert pool.fetched == []
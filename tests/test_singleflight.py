@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from singleflight import SingleFlight
+
+
+def test_do_runs_identical_calls_once():
+    flight = SingleFlight('test')
+    calls = []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return 42
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        first = pool.submit(flight.do, 'key', compute)
+        started.wait()
+        followers = [pool.submit(flight.do, 'key', compute) for _ in range(7)]
+        results = [future.result() for future in [first] + followers]
+    assert results == [42] * 8
+    assert len(calls) == 1
+
+
+def test_do_async_shares_result_and_cancels_with_the_last_caller():
+    async def scenario():
+        flight = SingleFlight('test')
+        calls = []
+        cancelled = asyncio.Event()
+
+        async def compute():
+            calls.append(1)
+            try:
+                await asyncio.sleep(0.05)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return 'answer'
+
+        assert await asyncio.gather(*[flight.do_async('key', compute) for _ in range(5)]) == ['answer'] * 5
+        assert len(calls) == 1
+
+        waiters = [asyncio.create_task(flight.do_async('other', compute)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        waiters[0].cancel()
+        await asyncio.sleep(0.01)
+        assert not cancelled.is_set()
+        waiters[1].cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        assert flight.stats()['in_flight'] == 0
+
+    asyncio.run(scenario())
+
+
+# Define async generator yielding tokens slowly and recording how often it was started
+def token_source(started, tokens=('a', 'b', 'c'), error=None):
+    async def generate():
+        started.append(1)
+        for token in tokens:
+            await asyncio.sleep(0.02)
+            yield token
+        if error is not None:
+            raise error
+    return generate
+
+
+# Define coroutine collecting every item of an async generator
+async def collect(agen):
+    return [item async for item in agen]
+
+
+def test_stream_fans_one_upstream_stream_out_to_every_caller():
+    async def scenario():
+        flight = SingleFlight('test')
+        started = []
+        first = asyncio.create_task(collect(flight.stream('key', token_source(started))))
+        await asyncio.sleep(0.03)
+        # A late caller gets the tokens produced so far, then the rest
+        late = await collect(flight.stream('key', token_source(started)))
+        assert await first == late == ['a', 'b', 'c']
+        assert len(started) == 1
+
+        # Once finished, the same key starts a new stream
+        assert await collect(flight.stream('key', token_source(started))) == ['a', 'b', 'c']
+        assert len(started) == 2
+        await asyncio.sleep(0)
+        assert flight.stats()['in_flight'] == 0
+
+    asyncio.run(scenario())
+
+
+def test_stream_error_reaches_every_caller_after_the_tokens():
+    async def scenario():
+        flight = SingleFlight('test')
+        source = token_source([], tokens=('a',), error=RuntimeError('upstream failed'))
+
+        async def read():
+            tokens = []
+            with pytest.raises(RuntimeError, match='upstream failed'):
+                async for token in flight.stream('key', source):
+                    tokens.append(token)
+            return tokens
+
+        assert await asyncio.gather(read(), read()) == [['a'], ['a']]
+
+    asyncio.run(scenario())
+
+
+def test_stream_is_cancelled_only_when_its_last_reader_stops():
+    async def scenario():
+        flight = SingleFlight('test')
+        closed = asyncio.Event()
+
+        async def endless():
+            try:
+                while True:
+                    await asyncio.sleep(0.01)
+                    yield 'token'
+            finally:
+                closed.set()
+
+        readers = [flight.stream('key', endless) for _ in range(2)]
+        assert await readers[0].__anext__() == 'token'
+        assert await readers[1].__anext__() == 'token'
+        await readers[0].aclose()
+        await asyncio.sleep(0.03)
+        assert not closed.is_set()
+        assert await readers[1].__anext__() == 'token'
+        await readers[1].aclose()
+        await asyncio.wait_for(closed.wait(), 1)
+        assert flight.stats()['in_flight'] == 0
+
+    asyncio.run(scenario())
+
+
+def test_disabled_stream_runs_every_call():
+    async def scenario():
+        flight = SingleFlight('test', enabled=False)
+        started = []
+        results = await asyncio.gather(*[collect(flight.stream('key', token_source(started))) for _ in range(3)])
+        assert results == [['a', 'b', 'c']] * 3
+        assert len(started) == 3
+
+    asyncio.run(scenario())
@@ -0,0 +1,13 @@
+from sql import sql_key
+
+
+def test_sql_key_ignores_whitespace_outside_literals():
+    assert sql_key("SELECT *  FROM product\n WHERE brand = 'NIKE'", (1,)) == \
+        sql_key("SELECT * FROM product WHERE brand = 'NIKE' ", [1])
+
+
+def test_sql_key_keeps_whitespace_inside_literals():
+    assert sql_key("SELECT * FROM product WHERE title LIKE '%running  shoes%'") != \
+        sql_key("SELECT * FROM product WHERE title LIKE '%running shoes%'")
+    assert sql_key("SELECT \"a  b\" FROM t") != sql_key("SELECT \"a b\" FROM t")
+    assert sql_key("SELECT 'it''s  here'") != sql_key("SELECT 'it''s here'")
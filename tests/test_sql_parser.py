@@ -0,0 +1,65 @@
+import pytest
+from sql_parser import ProductQuery, build_query, parse_question, render_answer
+
+BRANDS = {'nike': 'NIKE', 'puma': 'PUMA', 'red tape': 'RED TAPE', 'campus': 'CAMPUS'}
+
+
+@pytest.mark.parametrize('question, expected', [
+    ("Show me top 3 nike shoes with rating higher than 4.5.",
+     ProductQuery(['NIKE'], None, None, None, 4.5, 'avg_rating DESC', 3)),
+    ("nike shoes under Rs. 3000 with rating above 4",
+     ProductQuery(['NIKE'], None, 3000.0, None, 4.0, None, None)),
+    ("Puma shoes with more than 4 star rating between Rs. 1000 and 2000",
+     ProductQuery(['PUMA'], 1000.0, 2000.0, None, 4.0, None, None)),
+    ("I want to buy nike shoes that have 50% discount.",
+     ProductQuery(['NIKE'], None, None, 0.5, None, None, None)),
+    ("highest rated red tape shoes",
+     ProductQuery(['RED TAPE'], None, None, None, None, 'avg_rating DESC', None)),
+    ("Are there any campus shoes on sale?",
+     ProductQuery(['CAMPUS'], None, None, 0.01, None, None, None)),
+])
+def test_parses_formulaic_questions(question, expected):
+    assert parse_question(question, BRANDS) == expected
+
+
+@pytest.mark.parametrize('question', [
+    # Counts of ratings or reviews are not prices
+    "shoes with more than 1000 ratings",
+    "nike shoes with at least 2000 ratings",
+    "shoes with over 200 ratings",
+    "puma shoes with over 200 reviews under Rs. 3000",
+    "shoes with more than 500 user ratings",
+    # Rating words nothing consumed carry a constraint the parser does not understand
+    "nike shoes with good ratings",
+    "shoes rated well",
+    # Ratings above 5 are not ratings
+    "shoes with rating above 6",
+    # Unknown words and prices too small to be prices
+    "Do you have formal shoes in size 9?",
+    "nike shoes under 9",
+    "What is the return policy?",
+])
+def test_returns_none_for_questions_it_does_not_fully_understand(question):
+    assert parse_question(question, BRANDS) is None
+
+
+def test_build_query_is_parameterized():
+    query, params = build_query(ProductQuery(['NIKE'], 1000.0, 3000.0, None, 4.0, 'price ASC', 5))
+    assert query == (
+        "SELECT title, price, discount, avg_rating, product_link FROM product "
+        "WHERE brand IN (?) AND price >= ? AND price <= ? AND avg_rating >= ? ORDER BY price ASC LIMIT ?"
+    )
+    assert params == ['NIKE', 1000.0, 3000.0, 4.0, 5]
+
+
+def test_render_answer_compacts_links():
+    rows = [
+        ('Nike Revolution 6', 3295, 0.2, 4.3,
+         'https://www.flipkart.com/nike-revolution-6/p/itm1?pid=SHO1&lid=LSTSHO1ABC&marketplace=FLIPKART&srno=s_1_1'),
+        ('Campus North', 999, None, None, 'https://www.flipkart.com/campus-north/p/itm2'),
+    ]
+    assert render_answer(rows) == (
+        "1. Nike Revolution 6: Rs. 3295 (20 percent off), Rating: 4.3 https://www.flipkart.com/nike-revolution-6/p/itm1?pid=SHO1\n"
+        "2. Campus North: Rs. 999, Rating: N/A https://www.flipkart.com/campus-north/p/itm2"
+    )
+    assert render_answer([]) == "Sorry, I couldn't find any products matching your query."
@@ -1,16 +1,32 @@
-import pandas as pd
+# Streaming, incremental loader for the product catalog CSV into SQLite.
+#
+# Reads the CSV in chunks and upserts each chunk in one transaction with
+# INSERT ... ON CONFLICT(product_link) DO UPDATE, so re-running it is safe and
+# memory stays flat regardless of file size. A watermark (the file's SHA-256)
+# skips files that were already loaded, and rows whose values did not change
+# are not rewritten. The app's schema migrations (app/db.py) are applied after
+# the load.
+#
+# Usage:
+#     python csv_to_sqlite.py [--csv flipkart_product_data.csv] [--db db.sqlite] [--chunk-size 50000] [--force]
+import argparse
+import csv
+import hashlib
+import itertools
 import sqlite3
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
 
-# Database and CSV file path
-csv_file = 'flipkart_product_data.csv'
-db_file = 'db.sqlite'
+# Default CSV and database file paths (next to this script)
+csv_file = Path(__file__).parent / 'flipkart_product_data.csv'
+db_file = Path(__file__).parent / 'db.sqlite'
 
-# Connect to (or create) SQLite database
-conn = sqlite3.connect(db_file)
-cursor = conn.cursor()
+# Columns of the product table, in CSV order
+columns = ['product_link', 'title', 'brand', 'price', 'discount', 'avg_rating', 'total_ratings']
 
 # Create the product table (if it doesn't exist)
-# Define columns to match your CSV file columns
 create_table_query = """
 CREATE TABLE IF NOT EXISTS product (
     product_link TEXT PRIMARY KEY,
@@ -22,22 +38,130 @@ CREATE TABLE IF NOT EXISTS product (
     total_ratings INTEGER
 );
 """
-cursor.execute(create_table_query)
 
-# Commit the table creation
-conn.commit()
+# Tables created by older versions of this script may lack the primary key; upserts need a unique index
+create_unique_index_query = "CREATE UNIQUE INDEX IF NOT EXISTS idx_product_link ON product (product_link);"
+
+# Watermark of every loaded source file
+create_watermark_query = """
+CREATE TABLE IF NOT EXISTS catalog_load (
+    source TEXT PRIMARY KEY,
+    sha256 TEXT,
+    rows INTEGER,
+    loaded_at TEXT
+);
+"""
+
+# Upsert that only touches rows whose values actually changed
+upsert_query = f"""
+INSERT INTO product ({', '.join(columns)})
+VALUES ({', '.join('?' for _ in columns)})
+ON CONFLICT (product_link) DO UPDATE SET
+    {', '.join(f'{c} = excluded.{c}' for c in columns[1:])}
+WHERE ({', '.join(f'product.{c}' for c in columns[1:])})
+    IS NOT ({', '.join(f'excluded.{c}' for c in columns[1:])});
+"""
+
+
+# Define function hashing the source file in blocks (cheap compared to rewriting the table)
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Define function converting a CSV value to the column type; empty strings become NULL
+def convert(value, kind):
+    value = value.strip() if value is not None else ''
+    if value == '':
+        return None
+    return kind(float(value)) if kind is int else kind(value)
+
+
+# Define function turning one CSV record into a row tuple for the upsert
+def to_row(record):
+    return (
+        record['product_link'].strip(),
+        convert(record['title'], str),
+        convert(record['brand'], str),
+        convert(record['price'], int),
+        convert(record['discount'], float),
+        convert(record['avg_rating'], float),
+        convert(record['total_ratings'], int),
+    )
+
+
+# Define function loading the CSV into the database and returning (rows read, rows written)
+def load(csv_path, db_path, chunk_size=50000, force=False):
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute(create_table_query)
+        conn.execute(create_unique_index_query)
+        conn.execute(create_watermark_query)
+        conn.commit()
+
+        # Skip files that were loaded before, unless forced
+        source = str(Path(csv_path).resolve())
+        sha256 = file_sha256(csv_path)
+        watermark = conn.execute("SELECT sha256 FROM catalog_load WHERE source = ?", (source,)).fetchone()
+        if watermark and watermark[0] == sha256 and not force:
+            print(f"{csv_path} is unchanged since the last load, nothing to do.")
+            return 0, 0
+
+        # Durability is not needed while bulk loading; a failed load is simply re-run
+        conn.execute("PRAGMA synchronous=OFF")
+
+        start = time.perf_counter()
+        read = written = skipped = 0
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            records = csv.DictReader(f)
+            while True:
+                # Stop only when the file runs out; a chunk may hold nothing but rows without a product link
+                batch = list(itertools.islice(records, chunk_size))
+                if not batch:
+                    break
+                chunk = [to_row(r) for r in batch if r.get('product_link')]
+                skipped += len(batch) - len(chunk)
+                if not chunk:
+                    continue
+
+                # One transaction per chunk
+                with conn:
+                    cursor = conn.executemany(upsert_query, chunk)
+                read += len(chunk)
+                written += cursor.rowcount
+
+                elapsed = time.perf_counter() - start
+                print(f"Loaded {read} rows ({written} new or changed, {skipped} skipped), {read / elapsed:,.0f} rows/sec")
+
+        # Record the watermark once every chunk is in
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO catalog_load (source, sha256, rows, loaded_at) VALUES (?, ?, ?, ?)",
+                (source, sha256, read, datetime.now().isoformat(timespec='seconds')),
+            )
+        conn.execute("PRAGMA synchronous=FULL")
+
+        elapsed = time.perf_counter() - start
+        print(f"Done: {read} rows read, {written} written, {skipped} skipped without a product link in {elapsed:.2f}s ({read / max(elapsed, 1e-9):,.0f} rows/sec)")
+        return read, written
+    finally:
+        conn.close()
 
-# Insert DataFrame into the SQLite table
-df = pd.read_csv(csv_file)
-df.to_sql('product', conn, if_exists='append', index=False)
 
-print("Data inserted into SQLite table successfully.")
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load the product catalog CSV into SQLite incrementally.')
+    parser.add_argument('--csv', default=str(csv_file), help='Product CSV file')
+    parser.add_argument('--db', default=str(db_file), help='SQLite database file')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='Rows per transaction')
+    parser.add_argument('--force', action='store_true', help='Load even if the file was loaded before')
+    args = parser.parse_args()
 
-# Verify - Read back from the database
-result = pd.read_sql_query("SELECT * FROM product LIMIT 5;", conn)
-print("Sample from database:")
-print(result)
+    load(args.csv, args.db, args.chunk_size, args.force)
 
-# Close the connection
-conn.close()
-print("Database connection closed.")
+    # Bring the schema the app expects (indexes, FTS index, WAL mode) up to date
+    sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
+    from db import migrate
+    migrate(args.db)
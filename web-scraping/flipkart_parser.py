@@ -0,0 +1,77 @@
+# HTML parsing for Flipkart search result and product detail pages.
+#
+# Parsing is kept separate from fetching so it can be run offline against
+# saved HTML (e.g. `python scraper.py parse page.html`). The CSS class names
+# are the ones used by flipkart_data_extraction.ipynb.
+import re
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup
+
+# Base URL used to resolve relative product links
+website_link = 'https://www.flipkart.com/'
+
+# Product statuses that mean the product cannot be bought
+unavailable_statuses = ['Currently Unavailable', 'Sold Out']
+
+# Columns of a parsed product, matching flipkart_product_data.csv
+product_columns = ['product_link', 'title', 'brand', 'price', 'discount', 'avg_rating', 'total_ratings']
+
+
+# Raised when a page does not look like a product page (layout change, captcha, error page)
+class ParseError(ValueError):
+    pass
+
+
+# Define helper returning the stripped text of the first element with the given class, or None
+def _text(soup, class_name):
+    element = soup.find(class_=class_name)
+    return element.get_text(' ', strip=True) if element is not None else None
+
+
+# Define function extracting product detail page links from a search result page
+def parse_listing(html, base_url=website_link):
+    soup = BeautifulSoup(html, 'html.parser')
+    return [urljoin(base_url, a['href']) for a in soup.find_all('a', class_='rPDeLR') if a.get('href')]
+
+
+# Define function extracting product details from a product page
+# Returns a dict with product_columns, or None if the product is unavailable
+def parse_product(html, product_link):
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Products marked as unavailable are reported separately
+    if _text(soup, 'Z8JjpR') in unavailable_statuses:
+        return None
+
+    brand = _text(soup, 'mEh187')
+    title = _text(soup, 'VU-ZEz')
+    price = _text(soup, 'Nx9bqj')
+    if not (brand and title and price):
+        raise ParseError(f"Missing brand, title or price on {product_link}")
+
+    # Title - remove parenthetical color info
+    title = re.sub(r'\s*\([^)]*\)', '', title)
+
+    # Price - extract digits only
+    price = ''.join(re.findall(r'\d+', price))
+
+    # Discount - optional field, may be missing
+    discount = ''
+    discount_text = _text(soup, 'UkUFwK')
+    if discount_text:
+        discount_numbers = ''.join(re.findall(r'\d+', discount_text))
+        if discount_numbers:
+            discount = int(discount_numbers) / 100
+
+    # Ratings and Reviews - optional fields
+    avg_rating = ''
+    total_ratings = ''
+    if _text(soup, 'E3XX7J') != 'Be the first to Review this product':
+        rating_text = _text(soup, 'XQDdHH')
+        total_text = _text(soup, 'Wphh3N')
+        if rating_text and total_text:
+            avg_rating = rating_text
+            # Remove commas in ratings count
+            total_ratings = int(total_text.split(' ')[0].replace(',', ''))
+
+    return dict(zip(product_columns, [product_link, title, brand, price, discount, avg_rating, total_ratings]))
@@ -0,0 +1,296 @@
+# Parallel Flipkart scraper replacing the serial loops in flipkart_data_extraction.ipynb.
+#
+# Pages are fetched by a pool of worker threads, either with plain HTTP requests
+# (default; the pages are server rendered) or with one headless Chrome driver per
+# worker. Requests to the same host are rate limited, failed fetches are retried
+# with backoff, and every processed product URL is appended to a checkpoint file
+# so an interrupted run resumes where it stopped.
+#
+# Usage:
+#     python scraper.py links --query "sports shoes for women" --pages 25
+#     python scraper.py products --links flipkart_product_links.csv --workers 8 --rate 2
+#     python scraper.py parse saved_product_page.html
+import argparse
+import csv
+import json
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import quote_plus, urlsplit
+import httpx
+from flipkart_parser import ParseError, parse_listing, parse_product, product_columns, website_link
+
+# Default output files (next to this script)
+output_dir = Path(__file__).parent
+links_file = output_dir / 'flipkart_product_links.csv'
+products_file = output_dir / 'flipkart_product_data.csv'
+unavailable_file = output_dir / 'unavailable_products.csv'
+duplicates_file = output_dir / 'duplicate_products.csv'
+checkpoint_file = output_dir / 'scrape_checkpoint.jsonl'
+
+# Browser-like headers for plain HTTP fetching
+http_headers = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36',
+    'Accept-Language': 'en-IN,en;q=0.9',
+}
+
+# Columns identifying duplicate listings of the same product (as in the notebook)
+duplicate_key = ['brand', 'price', 'discount', 'avg_rating', 'total_ratings']
+
+
+# Raised for responses worth retrying (rate limiting, server errors)
+class RetryableError(Exception):
+    pass
+
+
+# Define a per-host rate limiter shared by all workers
+class RateLimiter:
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._next_slot = defaultdict(float)
+        self._lock = threading.Lock()
+
+    # Block until the next request to the URL's host is allowed
+    def wait(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot[host])
+            self._next_slot[host] = slot + self.interval
+        time.sleep(max(0.0, slot - now))
+
+
+# Define fetcher using plain HTTP requests with a keep-alive connection
+class HttpFetcher:
+    def __init__(self, timeout):
+        self.client = httpx.Client(headers=http_headers, follow_redirects=True, timeout=timeout)
+
+    def fetch(self, url):
+        response = self.client.get(url)
+        if response.status_code == 429 or response.status_code >= 500:
+            raise RetryableError(f"HTTP {response.status_code} for {url}")
+        response.raise_for_status()
+        return response.text
+
+    def close(self):
+        self.client.close()
+
+
+# Define fetcher using a headless Chrome driver, for pages that need JavaScript
+class SeleniumFetcher:
+    def __init__(self, timeout):
+        # Import here so that plain HTTP scraping works without selenium installed
+        from selenium import webdriver
+        from selenium.webdriver.support.ui import WebDriverWait
+        self._wait = WebDriverWait
+        options = webdriver.ChromeOptions()
+        options.add_argument('--headless=new')
+        self.driver = webdriver.Chrome(options=options)
+        self.driver.set_page_load_timeout(timeout)
+        self.timeout = timeout
+
+    def fetch(self, url):
+        self.driver.get(url)
+        # Wait for the page to fully load
+        self._wait(self.driver, self.timeout).until(
+            lambda d: d.execute_script('return document.readyState') == 'complete'
+        )
+        return self.driver.page_source
+
+    def close(self):
+        self.driver.quit()
+
+
+# Define a pool of worker threads, each owning one fetcher, with rate limiting and retries
+class FetchPool:
+    def __init__(self, mode='http', workers=4, rate=2.0, retries=3, timeout=30):
+        self.mode = mode
+        self.workers = workers
+        self.retries = retries
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate)
+        self._local = threading.local()
+        self._fetchers = []
+        self._lock = threading.Lock()
+
+    # Return the calling thread's fetcher, creating it on first use
+    def _fetcher(self):
+        fetcher = getattr(self._local, 'fetcher', None)
+        if fetcher is None:
+            fetcher = SeleniumFetcher(self.timeout) if self.mode == 'selenium' else HttpFetcher(self.timeout)
+            self._local.fetcher = fetcher
+            with self._lock:
+                self._fetchers.append(fetcher)
+        return fetcher
+
+    # Fetch one URL, retrying transient failures with exponential backoff
+    def fetch(self, url):
+        for attempt in range(self.retries + 1):
+            self.limiter.wait(url)
+            try:
+                return self._fetcher().fetch(url)
+            except (RetryableError, httpx.TransportError, TimeoutError) as e:
+                if attempt == self.retries:
+                    raise
+                print(f"Retrying {url} after error: {e}")
+                time.sleep(2 ** attempt)
+            except Exception as e:
+                # Selenium raises its own timeout/driver exceptions; retry those too
+                if self.mode != 'selenium' or attempt == self.retries:
+                    raise
+                print(f"Retrying {url} after error: {e}")
+                time.sleep(2 ** attempt)
+
+    # Apply fn(url) to every URL in parallel, yielding (url, result or exception) as they complete
+    def map(self, fn, urls):
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(fn, url): url for url in urls}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    yield url, future.result()
+                except Exception as e:
+                    yield url, e
+
+    def close(self):
+        for fetcher in self._fetchers:
+            fetcher.close()
+
+
+# Define function collecting product detail page links from the search result pages
+def scrape_links(pool, query, pages):
+    search_link = f"{website_link}search?q={quote_plus(query)}&page="
+    pagination_links = [f"{search_link}{i}" for i in range(1, pages + 1)]
+
+    all_product_links = []
+    for link, result in pool.map(lambda url: parse_listing(pool.fetch(url)), pagination_links):
+        if isinstance(result, Exception):
+            print(f"Failed to fetch {link}: {result}")
+            continue
+        print(f"{link} Done ------>")
+        all_product_links.extend(result)
+
+    # Remove any duplicate URLs while keeping their order
+    return list(dict.fromkeys(all_product_links))
+
+
+# Define function reading the checkpoint: product URL -> last recorded entry
+def read_checkpoint(path):
+    entries = {}
+    if Path(path).exists():
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    entries[entry['url']] = entry
+    return entries
+
+
+# Define function scraping product pages in parallel, resuming from the checkpoint
+def scrape_products(pool, product_links, checkpoint_path):
+    entries = read_checkpoint(checkpoint_path)
+
+    # Finished URLs (parsed or unavailable) are skipped; failed ones are tried again
+    pending = [url for url in product_links if entries.get(url, {}).get('status') not in ('ok', 'unavailable')]
+    print(f"{len(product_links) - len(pending)} products already in checkpoint, {len(pending)} to scrape")
+
+    def scrape(url):
+        product = parse_product(pool.fetch(url), url)
+        return {'url': url, 'status': 'ok' if product else 'unavailable', 'product': product}
+
+    done = 0
+    with open(checkpoint_path, 'a', encoding='utf-8') as checkpoint:
+        for url, result in pool.map(scrape, pending):
+            if isinstance(result, Exception):
+                kind = 'parse error' if isinstance(result, ParseError) else 'fetch error'
+                print(f"Failed ({kind}) for URL {url}: {result}")
+                result = {'url': url, 'status': 'failed', 'error': str(result)}
+            entries[url] = result
+
+            # Append and flush immediately so an interrupted run loses nothing
+            checkpoint.write(json.dumps(result) + '\n')
+            checkpoint.flush()
+            done += 1
+            print(f"URL {done}/{len(pending)} completed ({result['status']})")
+
+    return [entries[url] for url in product_links if url in entries]
+
+
+# Define function writing rows to a CSV file with a header
+def write_csv(path, header, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+# Define function splitting checkpoint entries into products, duplicates and unavailable links, and saving them
+def write_outputs(entries):
+    products, duplicates, unavailable = [], [], []
+    seen = set()
+    for entry in entries:
+        if entry['status'] != 'ok':
+            unavailable.append([entry['url']])
+            continue
+        row = [entry['product'][c] for c in product_columns]
+        key = tuple(entry['product'][c] for c in duplicate_key)
+        (duplicates if key in seen else products).append(row)
+        seen.add(key)
+
+    write_csv(products_file, product_columns, products)
+    write_csv(unavailable_file, ['link'], unavailable)
+    write_csv(duplicates_file, product_columns, duplicates)
+
+    print("Final Total Products: ", len(products))
+    print("Total Unavailable Products : ", len(unavailable))
+    print("Total Duplicate Products: ", len(duplicates))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scrape Flipkart product data in parallel.')
+    parser.add_argument('--mode', choices=['http', 'selenium'], default='http', help='How pages are fetched')
+    parser.add_argument('--workers', type=int, default=4, help='Parallel workers (one driver each in selenium mode)')
+    parser.add_argument('--rate', type=float, default=2.0, help='Max requests per second per host')
+    parser.add_argument('--retries', type=int, default=3, help='Retries per page on transient errors')
+    parser.add_argument('--timeout', type=float, default=30, help='Page load timeout in seconds')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    links_parser = commands.add_parser('links', help='Collect product links from search result pages')
+    links_parser.add_argument('--query', default='sports shoes for women')
+    links_parser.add_argument('--pages', type=int, default=25)
+
+    products_parser = commands.add_parser('products', help='Scrape product pages listed in the links CSV')
+    products_parser.add_argument('--links', default=str(links_file))
+    products_parser.add_argument('--limit', type=int, default=None, help='Only scrape the first N links')
+    products_parser.add_argument('--checkpoint', default=str(checkpoint_file))
+
+    parse_parser = commands.add_parser('parse', help='Parse saved product page HTML files offline')
+    parse_parser.add_argument('files', nargs='+')
+
+    args = parser.parse_args()
+
+    session_start_time = datetime.now().time()
+    print(f"Session Start Time: {session_start_time} ---------------------------> ")
+
+    if args.command == 'parse':
+        for file in args.files:
+            print(json.dumps(parse_product(Path(file).read_text(encoding='utf-8'), file)))
+    else:
+        pool = FetchPool(args.mode, args.workers, args.rate, args.retries, args.timeout)
+        try:
+            if args.command == 'links':
+                product_links = scrape_links(pool, args.query, args.pages)
+                write_csv(links_file, ['product_links'], [[link] for link in product_links])
+                print('Total Unique Product Detail Page Links', len(product_links))
+            else:
+                with open(args.links, newline='', encoding='utf-8') as f:
+                    product_links = [row['product_links'] for row in csv.DictReader(f)][:args.limit]
+                write_outputs(scrape_products(pool, product_links, args.checkpoint))
+        finally:
+            pool.close()
+
+    session_end_time = datetime.now().time()
+    print(f"Session End Time: {session_end_time} ---------------------------> ")